@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -85,6 +86,34 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# Page snapshots, section fragments, their version counters, the table
+# watermarks and the active page pointer are shared by every web process,
+# the management commands and the scheduler through this cache, so it must
+# not be process-local (LocMemCache). Set REDIS_URL to use Redis; otherwise
+# the database cache table is used (create it with `manage.py createcachetable`).
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'flimix_cache',
+            # Version counters are culled along with everything else past
+            # this, which only costs rebuilds
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -126,6 +155,16 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# How a page build resolves the content of its sections: 'merged' reads all
+# sections with as few queries as possible, 'threads' runs the queries of
+# each section on a bounded thread pool, each thread with its own connection
+SECTION_RESOLUTION_MODE = 'merged'
+SECTION_RESOLUTION_WORKERS = 8
+
+# Dotted path of the /api/search/ backend (see movies/search.py); None uses
+# the SQLite FTS5 index when it exists and plain icontains matching otherwise
+SEARCH_BACKEND = None
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite's default port
     "http://127.0.0.1:5173",
@@ -0,0 +1,100 @@
+"""
+Pointer to the active landing page.
+
+page_data needs the id of the active landing page on every request. The id
+is held in two places: a module-level copy in each process, trusted for
+LOCAL_POINTER_TTL seconds, and a shared copy in the cache. The read path
+only falls back to the database when both are missing (cold or flushed
+cache), and it never writes a row.
+
+The pointer is republished from the database after every committed change
+to a landing page (see movies/signals.py), so activation fans out with one
+cache write. Other processes pick the new pointer up within
+LOCAL_POINTER_TTL seconds.
+
+The shared copy only works with a cache every process sees. When the cache
+is process-local (see movies/shared_cache.py) the pointer is read from the
+database instead, once per LOCAL_POINTER_TTL per process.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import LandingPage
+from . import shared_cache
+
+POINTER_KEY = 'landing_page:active'
+
+# How long a process trusts its own copy of the pointer
+LOCAL_POINTER_TTL = 5
+
+# Stored in the cache when no landing page is active (None reads as a miss)
+NO_ACTIVE_PAGE = 0
+
+# (landing page id, monotonic expiry), replaced as a whole so readers never
+# need a lock
+_local = None
+
+
+def get_active_id():
+    """Get the id of the active landing page, or None if there is none"""
+    local = _local
+    if local is not None and local[1] > time.monotonic():
+        return local[0]
+
+    if not shared_cache.is_shared():
+        # Activations by other processes never reach a process-local cache
+        return _remember(_load_pointer())
+
+    pointer = cache.get(POINTER_KEY)
+    if pointer is None:
+        pointer = _load_pointer()
+        # Never overwrite a pointer published while we were reading
+        if not cache.add(POINTER_KEY, pointer, None):
+            pointer = cache.get(POINTER_KEY, pointer)
+    return _remember(pointer)
+
+
+async def aget_active_id():
+    """Async version of get_active_id()"""
+    local = _local
+    if local is not None and local[1] > time.monotonic():
+        return local[0]
+
+    if not shared_cache.is_shared():
+        return _remember(await _aload_pointer())
+
+    pointer = await cache.aget(POINTER_KEY)
+    if pointer is None:
+        pointer = await _aload_pointer()
+        if not await cache.aadd(POINTER_KEY, pointer, None):
+            pointer = await cache.aget(POINTER_KEY, pointer)
+    return _remember(pointer)
+
+
+def refresh_active_page():
+    """Republish the pointer from the database, e.g. after an activation commits"""
+    pointer = _load_pointer()
+    cache.set(POINTER_KEY, pointer, None)
+    return _remember(pointer)
+
+
+def _load_pointer():
+    landing_page_id = LandingPage.objects.filter(
+        is_active=True
+    ).order_by('pk').values_list('id', flat=True).first()
+    return landing_page_id or NO_ACTIVE_PAGE
+
+
+async def _aload_pointer():
+    landing_page_id = await LandingPage.objects.filter(
+        is_active=True
+    ).order_by('pk').values_list('id', flat=True).afirst()
+    return landing_page_id or NO_ACTIVE_PAGE
+
+
+def _remember(pointer):
+    global _local
+    landing_page_id = pointer or None
+    _local = (landing_page_id, time.monotonic() + LOCAL_POINTER_TTL)
+    return landing_page_id
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.contenttypes.admin import GenericTabularInline
 from .models import (
     Movie, Series, Genre, Section, SectionItem, 
-    LandingPage, LandingPageSection
+    LandingPage, LandingPageSection, LandingPageSchedule
 )
 
 class SectionItemInline(GenericTabularInline):
@@ -57,3 +57,9 @@ class LandingPageAdmin(admin.ModelAdmin):
 class LandingPageSectionAdmin(admin.ModelAdmin):
     list_display = ('landing_page', 'section', 'position')
     list_filter = ('landing_page', 'section')
+
+@admin.register(LandingPageSchedule)
+class LandingPageScheduleAdmin(admin.ModelAdmin):
+    list_display = ('landing_page', 'activate_at', 'status', 'warmed_at', 'activated_at')
+    list_filter = ('status',)
+    readonly_fields = ('warmed_at', 'activated_at')
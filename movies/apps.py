@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MoviesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movies'
+
+    def ready(self):
+        # Register cache invalidation receivers and the shared cache check
+        from . import signals  # noqa: F401
+        from . import shared_cache  # noqa: F401
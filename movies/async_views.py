@@ -0,0 +1,163 @@
+"""
+Async versions of the read-heavy API views, for serving under ASGI.
+
+A synchronous view holds a worker thread for the whole request. These views
+run on the event loop and await Django's async ORM and cache APIs instead,
+and independent queries (the content of each section being rendered) are
+awaited together with asyncio.gather. Responses are identical to the
+views in movies/views.py; the async views are routed under async/.
+"""
+import logging
+
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .models import Movie, Series, Section, SectionItem
+from .pagination import PaginationError, apaginate, get_page_size
+from .snapshot import aget_snapshot, alast_modified
+from .streaming import STREAM_CHUNK_SIZE, astream_request, wants_stream
+from .views import MOVIE_FIELDS, SERIES_FIELDS, get_requested_fields, project_queryset, serialize_content
+from .watermarks import aconditional_table_response, conditional_response
+
+logger = logging.getLogger(__name__)
+
+
+async def page_data(request):
+    """Async version of views.page_data"""
+    try:
+        snapshot = await aget_snapshot()
+        etag = quote_etag(f'page-{snapshot.landing_page_id}-{snapshot.version}')
+
+        def build_response():
+            response = HttpResponse(snapshot.body, content_type='application/json')
+            response['X-Page-Version'] = snapshot.version
+            return response
+
+        return conditional_response(request, etag, await alast_modified(snapshot), build_response)
+
+    except Exception as e:
+        logger.error(f"Error in async page_data view: {str(e)}")
+        return JsonResponse({
+            "error": "Failed to load page data",
+            "message": str(e)
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_sections(request):
+    """Async version of views.api_sections"""
+    try:
+        async def build_response():
+            sections = Section.objects.annotate(
+                content_count=Count('sectionitem')
+            ).order_by('position')
+
+            data = [
+                {
+                    'id': section.id,
+                    'name': section.name,
+                    'section_type': section.section_type,
+                    'content_selection_type': section.content_selection_type,
+                    'position': section.position,
+                    'content_count': section.content_count,
+                }
+                async for section in sections
+            ]
+
+            return JsonResponse(data, safe=False)
+
+        return await aconditional_table_response(request, ('section', 'sectionitem'), build_response)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+async def catalogue_response(request, queryset, allowed_fields):
+    """Async version of views.catalogue_response()"""
+    try:
+        fields = get_requested_fields(request, allowed_fields)
+        queryset = project_queryset(queryset, fields)
+
+        if wants_stream(request):
+            rows = queryset.order_by('title', 'id').aiterator(chunk_size=STREAM_CHUNK_SIZE)
+            return astream_request(request, (serialize_content(row, fields) async for row in rows))
+
+        if 'limit' not in request.GET and 'cursor' not in request.GET:
+            rows = queryset.order_by('title')
+            return JsonResponse([serialize_content(row, fields) async for row in rows], safe=False)
+
+        rows, next_cursor = await apaginate(
+            queryset,
+            ordering=request.GET.get('ordering', 'title'),
+            cursor=request.GET.get('cursor'),
+            page_size=get_page_size(request.GET.get('limit')),
+        )
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'results': [serialize_content(row, fields) for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_movies(request):
+    """Async version of views.api_movies"""
+    try:
+        return await aconditional_table_response(
+            request, ('movie', 'genre'),
+            lambda: catalogue_response(request, Movie.objects.all(), MOVIE_FIELDS)
+        )
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_series(request):
+    """Async version of views.api_series"""
+    try:
+        return await aconditional_table_response(
+            request, ('series', 'genre'),
+            lambda: catalogue_response(request, Series.objects.all(), SERIES_FIELDS)
+        )
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def api_section_content(request, section_id):
+    """Async version of views.api_section_content"""
+    try:
+        section = await aget_object_or_404(Section, id=section_id)
+        section_items = SectionItem.objects.filter(
+            section=section
+        ).select_related('card', 'content_type').order_by('position')
+
+        data = []
+        async for item in section_items:
+            content_data = {
+                'id': item.id,
+                'position': item.position,
+                'content_type': item.content_type.model,
+                'content_id': item.object_id,
+            }
+
+            # Add content details
+            if item.card:
+                content_data['content'] = {
+                    'title': item.card.title,
+                    'poster_url': item.card.poster_url,
+                    'description': item.card.description,
+                }
+
+            data.append(content_data)
+
+        return JsonResponse(data, safe=False)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
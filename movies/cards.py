@@ -0,0 +1,130 @@
+"""
+Keeps the denormalized ContentCard table in sync with movies and series.
+
+Every movie and series has one ContentCard holding the fields a page
+renders, and SectionItem.card points at it, so rendering a section is a
+single range scan over SectionItem's (section, position) index joined to
+the cards. Each genre's content is also kept as a newest-first
+GenreMembership list, so an automatic section reads the top of a ready-made
+list instead of joining and sorting the genre through tables.
+
+The functions here are the only writers of cards and memberships; they run
+from the signals in movies/signals.py (and bulk write paths call them
+directly), inside the writing transaction.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+from .models import ContentCard, GenreMembership, SectionItem
+
+
+def card_values(content):
+    """Card fields for a movie or series (genre_ids excluded)"""
+    return {
+        'kind': content.get_content_type(),
+        'title': content.title,
+        'description': content.description,
+        'poster_url': content.poster_url,
+        'background_image_url': content.background_image_url,
+        'link': content.link,
+        'duration_minutes': getattr(content, 'duration_minutes', None),
+        'seasons': getattr(content, 'seasons', None),
+        'episodes_count': getattr(content, 'episodes_count', None),
+        'release_year': content.release_year,
+        'created_at': content.created_at,
+    }
+
+
+def sync_card(content):
+    """Create or refresh the card of a movie or series"""
+    content_type = ContentType.objects.get_for_model(content)
+    card, created = ContentCard.objects.update_or_create(
+        content_type=content_type, object_id=content.pk, defaults=card_values(content)
+    )
+    if created:
+        # Items added before the card existed (e.g. during a backfill)
+        SectionItem.objects.filter(
+            content_type=content_type, object_id=content.pk, card__isnull=True
+        ).update(card=card)
+    else:
+        # Keep the card's place in its genre lists
+        GenreMembership.objects.filter(card=card).exclude(
+            created_at=card.created_at
+        ).update(created_at=card.created_at)
+    return card
+
+
+def delete_card(content):
+    """Delete the card of a deleted movie or series"""
+    ContentCard.objects.filter(
+        content_type=ContentType.objects.get_for_model(content), object_id=content.pk
+    ).delete()
+
+
+def refresh_genres(model, object_ids):
+    """
+    Bring the genre data of these movies or series up to date.
+
+    Recomputes ContentCard.genre_ids and adds or removes only the
+    GenreMembership rows that changed, with a handful of queries however
+    many ids are passed.
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    through = model.genres.through
+    column = f'{model.genres.field.m2m_field_name()}_id'
+
+    genre_ids = defaultdict(list)
+    for object_id, genre_id in through.objects.filter(
+        **{f'{column}__in': object_ids}
+    ).order_by('genre_id').values_list(column, 'genre_id'):
+        genre_ids[object_id].append(genre_id)
+
+    cards = list(ContentCard.objects.filter(
+        content_type=ContentType.objects.get_for_model(model), object_id__in=object_ids
+    ).only('id', 'object_id', 'created_at'))
+    for card in cards:
+        card.genre_ids = genre_ids[card.object_id]
+    ContentCard.objects.bulk_update(cards, ['genre_ids'])
+
+    wanted = {(card.id, genre_id) for card in cards for genre_id in card.genre_ids}
+    existing = set(GenreMembership.objects.filter(card__in=cards).values_list('card_id', 'genre_id'))
+
+    created_at = {card.id: card.created_at for card in cards}
+    GenreMembership.objects.bulk_create([
+        GenreMembership(card_id=card_id, genre_id=genre_id, created_at=created_at[card_id])
+        for card_id, genre_id in wanted - existing
+    ], ignore_conflicts=True)
+
+    removed = defaultdict(list)
+    for card_id, genre_id in existing - wanted:
+        removed[genre_id].append(card_id)
+    for genre_id, card_ids in removed.items():
+        GenreMembership.objects.filter(genre_id=genre_id, card_id__in=card_ids).delete()
+
+
+def card_id_for(content_type_id, object_id):
+    """Get the id of the card for a content type and id, or None"""
+    return ContentCard.objects.filter(
+        content_type_id=content_type_id, object_id=object_id
+    ).values_list('id', flat=True).first()
+
+
+def attach_cards(section_items):
+    """Point unsaved SectionItems at their cards, one query per content type (for bulk_create)"""
+    ids_by_type = defaultdict(set)
+    for item in section_items:
+        ids_by_type[item.content_type_id].add(item.object_id)
+
+    card_ids = {}
+    for content_type_id, object_ids in ids_by_type.items():
+        for card_id, object_id in ContentCard.objects.filter(
+            content_type_id=content_type_id, object_id__in=object_ids
+        ).values_list('id', 'object_id'):
+            card_ids[content_type_id, object_id] = card_id
+
+    for item in section_items:
+        item.card_id = card_ids.get((item.content_type_id, item.object_id))
+    return section_items
@@ -0,0 +1,180 @@
+"""
+Per-section fragment cache.
+
+Each section's JSON is cached on its own, already encoded, under a key made
+of the section id and a per-section content version. Invalidation bumps the
+version of the affected sections only (see movies/invalidation.py), so a
+hero edit re-renders the hero and nothing else. Pages are assembled by
+joining the encoded fragments, without decoding and re-encoding them, and a
+section shared by several landing pages is rendered once for all of them.
+"""
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import aprefetch_section_content
+from .scheduler import resolve_sections
+from . import shared_cache, versions
+
+FRAGMENT_KEY = 'section_fragment:{section_id}:{version}'
+VERSION_KEY = 'section_version:{section_id}'
+
+# Fragments of superseded versions are never read again; let them expire
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Stored for sections that have nothing to show, so they are not rebuilt
+EMPTY_FRAGMENT = b''
+
+
+def get_fragments(sections):
+    """
+    Get the encoded fragments for a list of sections, in order.
+
+    Cached fragments are read with two cache round trips (versions, then
+    fragments). Missing ones are rendered together, with their content
+    resolved up front by the section scheduler (movies/scheduler.py), and
+    stored.
+    """
+    section_versions = get_versions([section.id for section in sections])
+    keys = {
+        section.id: FRAGMENT_KEY.format(section_id=section.id, version=section_versions[section.id])
+        for section in sections
+    }
+    fragments = cache.get_many(list(keys.values()))
+
+    missing = [section for section in sections if keys[section.id] not in fragments]
+    if missing:
+        resolve_sections(missing)
+        built = {keys[section.id]: encode_section(section) for section in missing}
+        cache.set_many(built, shared_cache.timeout(FRAGMENT_TIMEOUT))
+        fragments.update(built)
+
+    return [fragments[keys[section.id]] for section in sections]
+
+
+def get_versions(section_ids):
+    """Get the content version of each section, initialising missing ones"""
+    keys = {section_id: VERSION_KEY.format(section_id=section_id) for section_id in section_ids}
+    cached = versions.get_versions(list(keys.values()))
+    return {section_id: cached[key] for section_id, key in keys.items()}
+
+
+async def aget_fragments(sections):
+    """Async version of get_fragments(), resolving missing sections concurrently"""
+    section_versions = await aget_versions([section.id for section in sections])
+    keys = {
+        section.id: FRAGMENT_KEY.format(section_id=section.id, version=section_versions[section.id])
+        for section in sections
+    }
+    fragments = await cache.aget_many(list(keys.values()))
+
+    missing = [section for section in sections if keys[section.id] not in fragments]
+    if missing:
+        await aprefetch_section_content(missing)
+        built = {keys[section.id]: encode_section(section) for section in missing}
+        await cache.aset_many(built, shared_cache.timeout(FRAGMENT_TIMEOUT))
+        fragments.update(built)
+
+    return [fragments[keys[section.id]] for section in sections]
+
+
+async def aget_versions(section_ids):
+    """Async version of get_versions()"""
+    keys = {section_id: VERSION_KEY.format(section_id=section_id) for section_id in section_ids}
+    cached = await versions.aget_versions(list(keys.values()))
+    return {section_id: cached[key] for section_id, key in keys.items()}
+
+
+def invalidate_fragments(section_ids):
+    """Bump the content version of sections so their fragments are rebuilt"""
+    versions.bump_versions(VERSION_KEY.format(section_id=section_id) for section_id in section_ids)
+
+
+def assemble_page(fragments):
+    """Join encoded section fragments into the encoded page body"""
+    children = b', '.join(fragment for fragment in fragments if fragment)
+    return b'{"type": "page", "children": [' + children + b']}'
+
+
+def encode_section(section):
+    """Render and encode one section, or EMPTY_FRAGMENT if it shows nothing"""
+    section_json = build_section(section)
+    if section_json is None:
+        return EMPTY_FRAGMENT
+    return json.dumps(section_json, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def build_section(section):
+    """Build the JSON for a single section, or None if it has nothing to show"""
+    section_json = {
+        "type": section.section_type,
+        "attributes": {
+            "title": section.settings.get('title', section.name),
+            **section.settings  # Include any additional settings
+        },
+        "children": []
+    }
+
+    # Get content for this section
+    content_items = section.get_content()
+
+    # Process content items based on section type
+    if section.section_type == 'hero' and content_items:
+        # For hero, we just use the first item
+        content, content_type = _unpack(content_items[0])
+
+        # Check if content is not None before accessing attributes
+        if content is not None:
+            section_json["attributes"].update({
+                "backgroundImage": content.background_image_url,
+                "title": content.title,  # This is the movie/series title
+                "description": content.description,
+                "contentType": content_type,
+                "cta": {"text": "Watch Now", "link": content.link}
+            })
+
+    else:
+        # For other section types (carousel, grid, etc.)
+        for item in content_items:
+            content, content_type = _unpack(item)
+            if content is not None:
+                section_json["children"].append(build_card(content, content_type))
+
+    # Only add sections with content
+    if section.section_type == 'hero' or section_json["children"]:
+        return section_json
+    return None
+
+
+def build_card(content, content_type):
+    """Build the card JSON for a movie or series"""
+    content_json = {
+        "type": f"{content_type}-card",
+        "attributes": {
+            "title": content.title,
+            "poster": content.poster_url,
+            "link": content.link,
+            "contentType": content_type,
+        }
+    }
+
+    # Add content type specific attributes
+    if content_type == 'movie' and hasattr(content, 'duration_minutes'):
+        content_json["attributes"]["duration"] = content.duration_minutes
+        content_json["attributes"]["releaseYear"] = content.release_year
+    elif content_type == 'series' and hasattr(content, 'seasons'):
+        content_json["attributes"]["seasons"] = content.seasons
+        content_json["attributes"]["episodes"] = content.episodes_count
+        content_json["attributes"]["releaseYear"] = content.release_year
+
+    return content_json
+
+
+def _unpack(item):
+    """Split a get_content() item into (content, content_type)"""
+    if isinstance(item, tuple):  # For automatic selection
+        return item
+    # For manual selection
+    content_type = item.get_content_type() if hasattr(item, 'get_content_type') else 'unknown'
+    return item, content_type
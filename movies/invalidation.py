@@ -0,0 +1,99 @@
+"""
+Dependency-tracked cache invalidation.
+
+Every cached page fragment depends on a known set of rows. This module maps
+a write to the sections and landing pages it actually feeds, using the
+relationship tables as the dependency index:
+
+    Movie / Series -> sections through SectionItem (manual selection)
+                   -> sections through auto_genre (automatic selection)
+                   -> rule-based sections selecting its genres, or
+                      selecting regardless of genre
+    Genre          -> sections through auto_genre or a rule naming it
+    Section        -> landing pages through LandingPageSection
+
+Only the affected section fragments and page snapshots are evicted, never
+the whole cache, and only once the writing transaction has committed, so a
+concurrent reader can never rebuild a fragment from data that is about to
+change.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .models import Section, SectionItem, LandingPageSection
+from .rules import rule_sections
+from . import fragments, snapshot, watermarks
+
+
+def sections_for_content(content, genre_ids=None):
+    """Get ids of the sections a movie or series appears in"""
+    content_type = ContentType.objects.get_for_model(content)
+    section_ids = set(SectionItem.objects.filter(
+        content_type=content_type, object_id=content.pk
+    ).values_list('section_id', flat=True))
+
+    if genre_ids is None:
+        genre_ids = content.genres.values_list('id', flat=True)
+    # Rules that ignore genre can show this content whatever its genres
+    section_ids.update(sections_for_genres(genre_ids, include_genreless=True))
+    return section_ids
+
+
+def sections_for_genres(genre_ids, include_genreless=False):
+    """Get ids of the automatic sections that select content by these genres"""
+    genre_ids = list(genre_ids)
+    section_ids = rule_sections(genre_ids, include_genreless)
+    if genre_ids:
+        section_ids.update(Section.objects.filter(
+            content_selection_type='automatic', auto_genre_id__in=genre_ids
+        ).values_list('id', flat=True))
+    return section_ids
+
+
+def landing_pages_for_sections(section_ids):
+    """Get ids of the landing pages that contain these sections"""
+    section_ids = list(section_ids)
+    if not section_ids:
+        return set()
+    return set(LandingPageSection.objects.filter(
+        section_id__in=section_ids
+    ).values_list('landing_page_id', flat=True))
+
+
+def invalidate_sections(section_ids):
+    """Evict cached fragments built from these sections, after commit"""
+    section_ids = set(section_ids)
+    if not section_ids:
+        return
+    landing_page_ids = landing_pages_for_sections(section_ids)
+    transaction.on_commit(lambda: _evict(landing_page_ids, section_ids))
+
+
+def invalidate_landing_pages(landing_page_ids):
+    """Evict cached fragments built from these landing pages, after commit"""
+    landing_page_ids = set(landing_page_ids)
+    if landing_page_ids:
+        transaction.on_commit(lambda: _evict(landing_page_ids))
+
+
+def invalidate_rows(rows):
+    """Invalidate whatever depends on rows changed in bulk (no post_save)"""
+    section_ids = set()
+    landing_page_ids = set()
+    tables = set()
+    for row in rows:
+        tables.add(watermarks.table_name(type(row)))
+        if isinstance(row, SectionItem):
+            section_ids.add(row.section_id)
+        elif isinstance(row, LandingPageSection):
+            landing_page_ids.add(row.landing_page_id)
+        # Section.position is only used by the admin, no page depends on it
+
+    watermarks.touch(*tables)
+    invalidate_sections(section_ids)
+    invalidate_landing_pages(landing_page_ids)
+
+
+def _evict(landing_page_ids, section_ids=()):
+    fragments.invalidate_fragments(section_ids)
+    snapshot.invalidate_snapshot(landing_page_ids)
@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from movies import shared_cache
+from movies.models import LandingPageSchedule
+from movies.snapshot import get_snapshot
+
+class Command(BaseCommand):
+    help = (
+        'Activate landing pages whose scheduled time has come. Snapshots of the '
+        'pages are pre-built ahead of time, so the switch itself only moves the '
+        'active page pointer. Pre-building needs a cache shared with the web '
+        'processes; with a process-local cache pages are only activated, and the '
+        'web processes read the active page from the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running, waking up for every warm-up and activation',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=30,
+            help='Longest time in seconds to sleep between checks with --loop (default: 30)',
+        )
+        parser.add_argument(
+            '--warmup-minutes',
+            type=float,
+            default=5,
+            help='How long before activation to pre-build the snapshot (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        warmup = timedelta(minutes=options['warmup_minutes'])
+        interval = max(options['interval'], 0.1)
+        # Snapshots built here would only land in this process's own cache
+        self.prebuild = shared_cache.is_shared()
+        if not self.prebuild:
+            self.stderr.write(self.style.WARNING(
+                'The default cache is process-local, so snapshots are not pre-built; '
+                'configure a shared cache in settings.CACHES (see movies.W001).'
+            ))
+
+        while True:
+            now = timezone.now()
+            if self.prebuild:
+                self.warm(now + warmup)
+            self.activate_due(now)
+            if not options['loop']:
+                break
+            time.sleep(self.seconds_until_next(warmup, interval))
+
+    def warm(self, horizon):
+        """Pre-build the snapshots of pages going live before horizon"""
+        schedules = LandingPageSchedule.objects.filter(
+            status='pending', warmed_at__isnull=True, activate_at__lte=horizon
+        ).select_related('landing_page')
+        for schedule in schedules:
+            started = time.monotonic()
+            get_snapshot(schedule.landing_page_id)
+            schedule.warmed_at = timezone.now()
+            schedule.save(update_fields=['warmed_at'])
+            self.stdout.write(
+                f"Warmed '{schedule.landing_page.name}' for {schedule.activate_at} "
+                f"({time.monotonic() - started:.2f}s)"
+            )
+
+    def activate_due(self, now):
+        """Activate every pending schedule whose time has come, oldest first"""
+        due = LandingPageSchedule.objects.filter(status='pending', activate_at__lte=now)
+        for schedule_id, landing_page_id in due.values_list('id', 'landing_page_id'):
+            if self.prebuild:
+                # Brings the snapshot up to date if content changed since warm-up
+                get_snapshot(landing_page_id)
+
+            with transaction.atomic():
+                schedule = LandingPageSchedule.objects.select_for_update().select_related(
+                    'landing_page'
+                ).filter(id=schedule_id, status='pending').first()
+                if schedule is None:
+                    # Cancelled, or handled by another worker meanwhile
+                    continue
+                schedule.landing_page.activate()
+                schedule.status = 'activated'
+                schedule.activated_at = timezone.now()
+                schedule.save(update_fields=['status', 'activated_at'])
+
+            lateness = (schedule.activated_at - schedule.activate_at).total_seconds()
+            self.stdout.write(self.style.SUCCESS(
+                f"Activated '{schedule.landing_page.name}' ({lateness:.1f}s after {schedule.activate_at})"
+            ))
+
+    def seconds_until_next(self, warmup, interval):
+        """Time to sleep until the next warm-up or activation, capped at interval"""
+        upcoming = LandingPageSchedule.objects.filter(status='pending').order_by('activate_at').first()
+        if upcoming is None:
+            return interval
+
+        now = timezone.now()
+        wake_at = upcoming.activate_at
+        if self.prebuild and upcoming.warmed_at is None and upcoming.activate_at - warmup > now:
+            wake_at = upcoming.activate_at - warmup
+        return min(interval, max((wake_at - now).total_seconds(), 0))
@@ -1,25 +1,121 @@
+import time
+
+from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
-from movies.models import SectionItem
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from movies.invalidation import invalidate_sections
+from movies.models import SectionItem, Tombstone
+from movies import watermarks
 
 class Command(BaseCommand):
-    help = 'Clean up orphaned SectionItem records where content_object is None'
+    help = 'Clean up orphaned SectionItem records whose content no longer exists'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report orphaned records without deleting them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records deleted per statement (default: 1000)',
+        )
 
     def handle(self, *args, **options):
-        # Find all SectionItem records where content_object is None
-        orphaned_items = []
-        for item in SectionItem.objects.all():
-            if item.content_object is None:
-                orphaned_items.append(item)
-        
-        if orphaned_items:
-            self.stdout.write(f"Found {len(orphaned_items)} orphaned SectionItem records:")
-            for item in orphaned_items:
-                self.stdout.write(f"  - SectionItem {item.id}: Section '{item.section.name}', ContentType {item.content_type}, ObjectID {item.object_id}")
-            
-            # Delete the orphaned items
-            for item in orphaned_items:
-                item.delete()
-            
-            self.stdout.write(self.style.SUCCESS(f"Successfully deleted {len(orphaned_items)} orphaned SectionItem records"))
+        dry_run = options['dry_run']
+        batch_size = max(options['batch_size'], 1)
+        verbosity = options['verbosity']
+        started = time.monotonic()
+
+        # Orphans are found per content type with an anti-join against the
+        # content table, instead of dereferencing every item one by one
+        total_found = 0
+        total_deleted = 0
+        content_type_ids = SectionItem.objects.order_by().values_list('content_type_id', flat=True).distinct()
+        for content_type_id in content_type_ids:
+            content_type = ContentType.objects.get_for_id(content_type_id)
+            orphans = self.orphans_for(content_type)
+
+            found = orphans.count()
+            if not found:
+                continue
+            total_found += found
+            self.stdout.write(f"Found {found} orphaned SectionItem records for ContentType {content_type}")
+
+            if verbosity >= 2:
+                for item in orphans.order_by('id').values('id', 'section_id', 'object_id').iterator():
+                    self.stdout.write(
+                        f"  - SectionItem {item['id']}: Section {item['section_id']}, ObjectID {item['object_id']}"
+                    )
+
+            if not dry_run:
+                total_deleted += self.delete_in_batches(orphans, batch_size, started, total_deleted)
+
+        elapsed = time.monotonic() - started
+        if not total_found:
+            self.stdout.write(self.style.SUCCESS("No orphaned SectionItem records found"))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: {total_found} orphaned SectionItem records would be deleted ({elapsed:.1f}s)"
+            ))
         else:
-            self.stdout.write(self.style.SUCCESS("No orphaned SectionItem records found")) 
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS(
+                f"Successfully deleted {total_deleted} orphaned SectionItem records "
+                f"in {elapsed:.1f}s ({self.rate(total_deleted, elapsed)})"
+            ))
+
+    def orphans_for(self, content_type):
+        """SectionItems of a content type whose object does not exist"""
+        items = SectionItem.objects.filter(content_type=content_type)
+        model = content_type.model_class()
+        if model is None:
+            # The model itself is gone, so every item is orphaned
+            return items
+        return items.filter(~Exists(model._base_manager.filter(pk=OuterRef('object_id'))))
+
+    def delete_in_batches(self, orphans, batch_size, started, deleted_before):
+        """Delete orphans in chunks walking the primary key, reporting progress"""
+        deleted = 0
+        last_id = 0
+        while True:
+            rows = list(
+                orphans.filter(id__gt=last_id).order_by('id').values_list('id', 'section_id')[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            self.delete_batch(rows)
+            deleted += len(rows)
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"  Deleted {deleted_before + deleted} records ({self.rate(deleted_before + deleted, elapsed)})"
+            )
+        return deleted
+
+    def delete_batch(self, rows):
+        """
+        Delete one chunk of (id, section_id) orphans with a fixed number of queries.
+
+        SectionItem has post_delete receivers, so a queryset delete() would
+        load every row and send the tombstone and invalidation signals once
+        per item. Their work is done here once for the whole chunk instead,
+        and the rows are deleted with a single DELETE.
+        """
+        ids = [item_id for item_id, _ in rows]
+        with transaction.atomic():
+            Tombstone.record(SectionItem, ids)
+            invalidate_sections({section_id for _, section_id in rows})
+            watermarks.touch(watermarks.table_name(SectionItem))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {connection.ops.quote_name(SectionItem._meta.db_table)} "
+                    f"WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                    ids,
+                )
+
+    def rate(self, count, elapsed):
+        return f"{count / elapsed:.0f} records/s" if elapsed > 0 else f"{count} records"
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('movies', '0002_updated_at_and_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='landingpage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['is_active'], name='movies_landingpage_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='landingpagesection',
+            index=models.Index(fields=['landing_page', 'position'], name='movies_land_landing_f92356_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['created_at', 'id'], name='movies_movi_created_aa1abc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['title', 'id'], name='movies_movi_title_5260dc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectionitem',
+            index=models.Index(fields=['section', 'position'], name='movies_sect_section_697c04_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='series',
+            index=models.Index(fields=['created_at', 'id'], name='movies_seri_created_956af1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='series',
+            index=models.Index(fields=['title', 'id'], name='movies_seri_title_868387_idx'),
+        ),
+        # The auto-created genre through tables only have (content, genre);
+        # genre feeds need the reverse direction, covering the join column
+        migrations.RunSQL(
+            'CREATE INDEX movies_movie_genres_genre_movie_idx ON movies_movie_genres (genre_id, movie_id)',
+            'DROP INDEX movies_movie_genres_genre_movie_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX movies_series_genres_genre_series_idx ON movies_series_genres (genre_id, series_id)',
+            'DROP INDEX movies_series_genres_genre_series_idx',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+def keep_one_active_page(apps, schema_editor):
+    # Earlier non-atomic activations may have left several pages active;
+    # keep the most recently updated one
+    LandingPage = apps.get_model('movies', 'LandingPage')
+    active = list(LandingPage.objects.filter(is_active=True).order_by('-updated_at', '-id').values_list('id', flat=True))
+    if len(active) > 1:
+        LandingPage.objects.filter(id__in=active[1:]).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='landingpage',
+            name='movies_landingpage_active_idx',
+        ),
+        migrations.RunPython(keep_one_active_page, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='landingpage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='movies_landingpage_one_active'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_single_active_landing_page'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LandingPageSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activate_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('activated', 'Activated'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('warmed_at', models.DateTimeField(blank=True, null=True)),
+                ('activated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('landing_page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='movies.landingpage')),
+            ],
+            options={
+                'ordering': ['activate_at'],
+                'indexes': [models.Index(fields=['status', 'activate_at'], name='movies_land_status_3c9fe2_idx')],
+            },
+        ),
+    ]
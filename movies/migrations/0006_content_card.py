@@ -0,0 +1,99 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:06
+
+from collections import defaultdict
+from itertools import islice
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_cards(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    ContentCard = apps.get_model('movies', 'ContentCard')
+    SectionItem = apps.get_model('movies', 'SectionItem')
+
+    for model_name in ('movie', 'series'):
+        model = apps.get_model('movies', model_name)
+        content_type, _ = ContentType.objects.get_or_create(app_label='movies', model=model_name)
+
+        genre_ids = defaultdict(list)
+        through = model.genres.through
+        for object_id, genre_id in through.objects.order_by('genre_id').values_list(f'{model_name}_id', 'genre_id'):
+            genre_ids[object_id].append(genre_id)
+
+        cards = (
+            ContentCard(
+                content_type=content_type,
+                object_id=content.id,
+                kind=model_name,
+                title=content.title,
+                description=content.description,
+                poster_url=content.poster_url,
+                background_image_url=content.background_image_url,
+                link=content.link,
+                duration_minutes=getattr(content, 'duration_minutes', None),
+                seasons=getattr(content, 'seasons', None),
+                episodes_count=getattr(content, 'episodes_count', None),
+                release_year=content.release_year,
+                created_at=content.created_at,
+                genre_ids=genre_ids[content.id],
+            )
+            for content in model.objects.iterator(chunk_size=2000)
+        )
+        while True:
+            batch = list(islice(cards, 2000))
+            if not batch:
+                break
+            ContentCard.objects.bulk_create(batch)
+
+        SectionItem.objects.filter(content_type=content_type).update(card_id=Subquery(
+            ContentCard.objects.filter(
+                content_type=content_type, object_id=OuterRef('object_id')
+            ).values('id')[:1]
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('movies', '0005_landing_page_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('movie', 'Movie'), ('series', 'Series')], max_length=10)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('poster_url', models.URLField(max_length=1000)),
+                ('background_image_url', models.URLField(max_length=1000)),
+                ('link', models.CharField(default='#', max_length=255)),
+                ('duration_minutes', models.PositiveIntegerField(blank=True, null=True)),
+                ('seasons', models.PositiveIntegerField(blank=True, null=True)),
+                ('episodes_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('release_year', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('genre_ids', models.JSONField(blank=True, default=list)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sectionitem',
+            name='card',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='section_items', to='movies.contentcard'),
+        ),
+        migrations.AddIndex(
+            model_name='contentcard',
+            index=models.Index(fields=['created_at', 'id'], name='movies_cont_created_6a235d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='contentcard',
+            unique_together={('content_type', 'object_id')},
+        ),
+        migrations.RunPython(backfill_cards, migrations.RunPython.noop),
+    ]
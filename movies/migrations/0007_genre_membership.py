@@ -0,0 +1,49 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:07
+
+from itertools import islice
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_memberships(apps, schema_editor):
+    # Cards already carry their genre ids (see 0006_content_card)
+    ContentCard = apps.get_model('movies', 'ContentCard')
+    GenreMembership = apps.get_model('movies', 'GenreMembership')
+
+    memberships = (
+        GenreMembership(genre_id=genre_id, card_id=card_id, created_at=created_at)
+        for card_id, created_at, genre_ids in ContentCard.objects.values_list(
+            'id', 'created_at', 'genre_ids'
+        ).iterator(chunk_size=2000)
+        for genre_id in genre_ids
+    )
+    while True:
+        batch = list(islice(memberships, 2000))
+        if not batch:
+            break
+        GenreMembership.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_content_card'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenreMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='movies.contentcard')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='movies.genre')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['genre', 'created_at', 'card'], name='movies_genr_genre_i_045fd9_idx')],
+                'unique_together': {('genre', 'card')},
+            },
+        ),
+        migrations.RunPython(backfill_memberships, migrations.RunPython.noop),
+    ]
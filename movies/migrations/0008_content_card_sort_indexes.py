@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('movies', '0007_genre_membership'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contentcard',
+            index=models.Index(fields=['title', 'id'], name='movies_cont_title_ce3916_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contentcard',
+            index=models.Index(fields=['release_year', 'id'], name='movies_cont_release_ec369e_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Full-text index over the cards' title and description for the FTS5 search
+# backend (movies/search.py). It is an external content table: the text
+# lives in movies_contentcard only and the triggers keep the index in step.
+CREATE_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE movies_contentcard_fts USING fts5(
+        title, description,
+        content='movies_contentcard', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='3'
+    )
+    """,
+    """
+    CREATE TRIGGER movies_contentcard_fts_insert AFTER INSERT ON movies_contentcard BEGIN
+        INSERT INTO movies_contentcard_fts (rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_contentcard_fts_delete AFTER DELETE ON movies_contentcard BEGIN
+        INSERT INTO movies_contentcard_fts (movies_contentcard_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_contentcard_fts_update AFTER UPDATE OF title, description ON movies_contentcard BEGIN
+        INSERT INTO movies_contentcard_fts (movies_contentcard_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO movies_contentcard_fts (rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO movies_contentcard_fts (movies_contentcard_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS movies_contentcard_fts_update",
+    "DROP TRIGGER IF EXISTS movies_contentcard_fts_delete",
+    "DROP TRIGGER IF EXISTS movies_contentcard_fts_insert",
+    "DROP TABLE IF EXISTS movies_contentcard_fts",
+]
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases use the basic search backend, and SQLite builds
+    # without FTS5 fall back to it as well
+    if fts5_available(schema_editor.connection):
+        for statement in CREATE_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_content_card_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from collections import defaultdict
+import asyncio
 import json
 
 class Content(models.Model):
@@ -26,11 +28,19 @@ class Movie(models.Model):
     background_image_url = models.URLField(max_length=1000)
     link = models.CharField(max_length=255, default="#")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     duration_minutes = models.PositiveIntegerField(default=0)
     release_year = models.PositiveIntegerField(null=True, blank=True)
     # Add specific related_name to avoid conflicts
     genres = models.ManyToManyField('Genre', related_name='movies')
     
+    class Meta:
+        indexes = [
+            # Newest-first feeds (walked backwards) and title keyset pages
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['title', 'id']),
+        ]
+    
     def __str__(self):
         return self.title
     
@@ -45,12 +55,19 @@ class Series(models.Model):
     background_image_url = models.URLField(max_length=1000)
     link = models.CharField(max_length=255, default="#")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     seasons = models.PositiveIntegerField(default=1)
     episodes_count = models.PositiveIntegerField(default=0)
     release_year = models.PositiveIntegerField(null=True, blank=True)
     # Add specific related_name to avoid conflicts
     genres = models.ManyToManyField('Genre', related_name='series')
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['title', 'id']),
+        ]
+    
     def __str__(self):
         return self.title
     
@@ -98,6 +115,14 @@ class Section(models.Model):
     
     # Additional settings as JSON
     settings = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    # Default and maximum number of items shown by an automatic section,
+    # overridable per section with settings['limit'] (and settings['offset'])
+    AUTO_CONTENT_LIMIT = 20
+    MAX_AUTO_CONTENT_LIMIT = 100
+    # Skipped rows are still read, so the offset is capped as well
+    MAX_AUTO_CONTENT_OFFSET = 500
     
     class Meta:
         ordering = ['position']
@@ -107,29 +132,124 @@ class Section(models.Model):
     
     def get_content(self):
         """Get content for this section based on selection type"""
+        # Use content resolved up front by prefetch_section_content() or
+        # aprefetch_section_content()
+        if hasattr(self, '_prefetched_content'):
+            return self._prefetched_content
+        
         if self.content_selection_type == 'manual':
-            # Filter out None content objects (deleted content)
-            content_items = []
-            for item in self.sectionitem_set.all().order_by('position'):
-                if item.content_object is not None:
-                    content_items.append(item.content_object)
-            return content_items
-        elif self.content_selection_type == 'automatic' and self.auto_genre:
-            # Get all content with this genre
-            movies = Movie.objects.filter(genres=self.auto_genre)
-            series = Series.objects.filter(genres=self.auto_genre)
-            
-            # Combine and sort by created_at (most recent first)
-            # This is a simplified approach - in production you'd want to paginate
-            movie_list = [(movie, 'movie') for movie in movies]
-            series_list = [(series, 'series') for series in series]
-            combined = movie_list + series_list
-            
-            # Sort by created_at (most recent first)
-            # Note: This is inefficient for large datasets
-            return sorted(combined, key=lambda x: x[0].created_at, reverse=True)
+            # Skip items without a card (deleted content)
+            items = self.sectionitem_set.select_related('card').order_by('position')
+            return [item.card for item in items if item.card is not None]
+        
+        feed = self.get_feed()
+        if feed is not None:
+            return read_feed(feed)
         
         return []
+    
+    def get_feed(self):
+        """
+        Get what an automatic section shows, or None if it shows nothing.
+        
+        A compiled Rule for sections with settings['rules'] (see
+        movies/rules.py), otherwise (genre_id, limit, offset) for the newest
+        content of auto_genre. Equal feeds select the same content, so they
+        can be resolved once for many sections.
+        """
+        if self.content_selection_type != 'automatic':
+            return None
+        if 'rules' in self.settings:
+            from .rules import RuleError, compile_rule
+            try:
+                return compile_rule(self.settings['rules'])
+            except RuleError:
+                # Rules are validated when saved; one that no longer
+                # compiles shows nothing rather than breaking the page
+                return None
+        if self.auto_genre_id:
+            limit, offset = self.get_feed_window()
+            return (self.auto_genre_id, limit, offset)
+        return None
+    
+    def get_feed_window(self):
+        """Get (limit, offset) for automatic selection from the section settings"""
+        try:
+            limit = int(self.settings.get('limit', self.AUTO_CONTENT_LIMIT))
+        except (TypeError, ValueError):
+            limit = self.AUTO_CONTENT_LIMIT
+        try:
+            offset = int(self.settings.get('offset', 0))
+        except (TypeError, ValueError):
+            offset = 0
+        return (
+            min(max(limit, 0), self.MAX_AUTO_CONTENT_LIMIT),
+            min(max(offset, 0), self.MAX_AUTO_CONTENT_OFFSET),
+        )
+
+class ContentCard(models.Model):
+    """
+    Denormalized read model of a movie or series.
+    
+    Holds exactly the fields a rendered card or hero needs, for both content
+    types, so sections render without going through the GenericForeignKey.
+    Written only by movies/cards.py, from the signals in movies/signals.py.
+    """
+    KINDS = [
+        ('movie', 'Movie'),
+        ('series', 'Series'),
+    ]
+    
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    poster_url = models.URLField(max_length=1000)
+    background_image_url = models.URLField(max_length=1000)
+    link = models.CharField(max_length=255, default="#")
+    duration_minutes = models.PositiveIntegerField(null=True, blank=True)
+    seasons = models.PositiveIntegerField(null=True, blank=True)
+    episodes_count = models.PositiveIntegerField(null=True, blank=True)
+    release_year = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    genre_ids = models.JSONField(default=list, blank=True)
+    
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+        indexes = [
+            # The sort keys of rule-based sections (movies/rules.py)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['release_year', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} ({self.kind})"
+    
+    def get_content_type(self):
+        return self.kind
+
+class GenreMembership(models.Model):
+    """
+    Materialized newest-first list of the content in each genre.
+    
+    One row per (genre, card), carrying the content's created_at so the
+    list is read straight off its index. Maintained incrementally by
+    movies/cards.py from the genre m2m_changed signals.
+    """
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='memberships')
+    card = models.ForeignKey(ContentCard, on_delete=models.CASCADE, related_name='memberships')
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('genre', 'card')
+        indexes = [
+            models.Index(fields=['genre', 'created_at', 'card']),
+        ]
+    
+    def __str__(self):
+        return f"{self.genre.name} - {self.card.title}"
 
 class SectionItem(models.Model):
     """An item in a section, using GenericForeignKey to support different content types"""
@@ -140,15 +260,170 @@ class SectionItem(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
+    # Card of the same content, for rendering without the generic relation
+    card = models.ForeignKey(
+        ContentCard, on_delete=models.SET_NULL, null=True, blank=True, related_name='section_items'
+    )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         ordering = ['position']
         unique_together = ('section', 'content_type', 'object_id')
+        indexes = [
+            models.Index(fields=['section', 'position']),
+        ]
     
     def __str__(self):
         content_name = str(self.content_object) if self.content_object else "Unknown"
         return f"{self.section.name} - {content_name} (Pos: {self.position})"
 
+class Tombstone(models.Model):
+    """Record of a deleted row, so incremental sync can report deletions"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [
+            models.Index(fields=['content_type', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id} (Deleted: {self.deleted_at})"
+    
+    @classmethod
+    def record(cls, model, object_ids):
+        """Record the deletion of rows of a model, with one INSERT however many there are"""
+        content_type = ContentType.objects.get_for_model(model)
+        cls.objects.bulk_create([cls(content_type=content_type, object_id=object_id) for object_id in object_ids])
+
+def resolve_section_items(section_items):
+    """
+    Resolve content_object for many SectionItems at once.
+    
+    Items are grouped by content type and each model is fetched with a
+    single in_bulk() query, so the cost is one query per content type
+    instead of one per item. Resolved objects (or None for deleted content)
+    are stored in the GenericForeignKey cache. Returns the items as a list,
+    in their original order.
+    """
+    items = list(section_items)
+    
+    ids_by_type = defaultdict(set)
+    for item in items:
+        ids_by_type[item.content_type_id].add(item.object_id)
+    
+    objects_by_type = {}
+    for content_type_id, object_ids in ids_by_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        objects_by_type[content_type_id] = model.objects.in_bulk(object_ids) if model else {}
+    
+    content_object = SectionItem._meta.get_field('content_object')
+    for item in items:
+        content = objects_by_type[item.content_type_id].get(item.object_id)
+        content_object.set_cached_value(item, content)
+    
+    return items
+
+def newest_in_genre(genre_id, limit, offset=0):
+    """
+    Get the cards of the newest movies and series with a genre.
+    
+    Reads the genre's ready-made GenreMembership list, newest first, as one
+    range scan over its (genre, created_at, card) index cut to the window,
+    so the cost is O(limit) rows no matter how large the genre is.
+    """
+    if limit <= 0:
+        return []
+    memberships = GenreMembership.objects.filter(
+        genre_id=genre_id
+    ).select_related('card').order_by('-created_at', '-card_id')[offset:offset + limit]
+    return [membership.card for membership in memberships]
+
+def read_feed(feed):
+    """Get the cards of a feed returned by Section.get_feed()"""
+    from .rules import Rule, select_cards
+    
+    if isinstance(feed, Rule):
+        return select_cards(feed)
+    return newest_in_genre(*feed)
+
+def prefetch_section_content(sections):
+    """
+    Load the content of all manual sections in one pass.
+    
+    The items of every manual section are read with a single query over
+    the (section, position) index, joined to their ContentCards, so a whole
+    landing page costs one query however many content types it shows.
+    Section.get_content() then returns the prefetched cards without
+    touching the database.
+    """
+    manual_sections = [s for s in sections if s.content_selection_type == 'manual']
+    if not manual_sections:
+        return
+    
+    section_items = SectionItem.objects.filter(
+        section__in=manual_sections
+    ).select_related('card').order_by('section_id', 'position')
+    
+    content_by_section = defaultdict(list)
+    for item in section_items:
+        if item.card is not None:
+            content_by_section[item.section_id].append(item.card)
+    
+    for section in manual_sections:
+        section._prefetched_content = content_by_section[section.id]
+
+async def anewest_in_genre(genre_id, limit, offset=0):
+    """Async version of newest_in_genre()"""
+    if limit <= 0:
+        return []
+    memberships = GenreMembership.objects.filter(
+        genre_id=genre_id
+    ).select_related('card').order_by('-created_at', '-card_id')[offset:offset + limit]
+    return [membership.card async for membership in memberships]
+
+async def aread_feed(feed):
+    """Async version of read_feed()"""
+    from .rules import Rule, aselect_cards
+    
+    if isinstance(feed, Rule):
+        return await aselect_cards(feed)
+    return await anewest_in_genre(*feed)
+
+async def aprefetch_section_content(sections):
+    """
+    Async version of prefetch_section_content() that covers automatic sections too.
+    
+    The items of all manual sections are still loaded with one query, and
+    the feed of each automatic section is read concurrently with them, so
+    Section.get_content() never touches the database afterwards.
+    """
+    manual_sections = [s for s in sections if s.content_selection_type == 'manual']
+    automatic_sections = [s for s in sections if s.content_selection_type == 'automatic']
+    
+    async def prefetch_manual():
+        if not manual_sections:
+            return
+        section_items = SectionItem.objects.filter(
+            section__in=manual_sections
+        ).select_related('card').order_by('section_id', 'position')
+        
+        content_by_section = defaultdict(list)
+        async for item in section_items:
+            if item.card is not None:
+                content_by_section[item.section_id].append(item.card)
+        
+        for section in manual_sections:
+            section._prefetched_content = content_by_section[section.id]
+    
+    async def prefetch_feed(section):
+        feed = section.get_feed()
+        section._prefetched_content = [] if feed is None else await aread_feed(feed)
+    
+    await asyncio.gather(prefetch_manual(), *(prefetch_feed(section) for section in automatic_sections))
+
 class LandingPage(models.Model):
     """Landing page configuration"""
     name = models.CharField(max_length=255)
@@ -157,24 +432,73 @@ class LandingPage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        constraints = [
+            # At most one active page; also the one-row index get_active() reads
+            models.UniqueConstraint(
+                fields=['is_active'], condition=models.Q(is_active=True), name='movies_landingpage_one_active'
+            ),
+        ]
+    
     def __str__(self):
         status = "Active" if self.is_active else "Inactive"
         return f"{self.name} ({status})"
     
     def activate(self):
         """Make this landing page active and deactivate others"""
-        LandingPage.objects.exclude(id=self.id).update(is_active=False)
-        self.is_active = True
-        self.save()
+        with transaction.atomic():
+            # Lock every landing page so concurrent activations run one
+            # after another; the last one to commit wins
+            list(LandingPage.objects.select_for_update().values_list('id', flat=True))
+            LandingPage.objects.filter(is_active=True).exclude(id=self.id).update(is_active=False)
+            self.is_active = True
+            # post_save republishes the active page pointer once this commits
+            self.save()
     
     @classmethod
     def get_active(cls):
-        """Get the active landing page or create a default one"""
+        """Get the active landing page, or None if no page is active"""
+        from .active_page import get_active_id
+        
+        # The id comes from the cached pointer, so only the row itself is read
+        landing_page_id = get_active_id()
+        if landing_page_id is None:
+            return None
+        return cls.objects.filter(id=landing_page_id).first()
+    
+    @classmethod
+    def get_or_create_active(cls):
+        """Get the active landing page or create a default one (admin only)"""
         active = cls.objects.filter(is_active=True).first()
         if not active:
             active = cls.objects.create(name="Default Landing Page", is_active=True)
         return active
 
+class LandingPageSchedule(models.Model):
+    """A landing page activation scheduled for a given time"""
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('activated', 'Activated'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    landing_page = models.ForeignKey(LandingPage, on_delete=models.CASCADE, related_name='schedules')
+    activate_at = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    # Set once the page's snapshot has been pre-built ahead of the switch
+    warmed_at = models.DateTimeField(null=True, blank=True)
+    activated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['activate_at']
+        indexes = [
+            models.Index(fields=['status', 'activate_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.landing_page.name} at {self.activate_at} ({self.get_status_display()})"
+
 class LandingPageSection(models.Model):
     """Association between landing pages and sections with position ordering"""
     landing_page = models.ForeignKey(LandingPage, on_delete=models.CASCADE)
@@ -184,6 +508,9 @@ class LandingPageSection(models.Model):
     class Meta:
         ordering = ['position']
         unique_together = ('landing_page', 'section')
+        indexes = [
+            models.Index(fields=['landing_page', 'position']),
+        ]
     
     def __str__(self):
         return f"{self.landing_page.name} - {self.section.name} (Pos: {self.position})"
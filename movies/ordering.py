@@ -0,0 +1,166 @@
+"""
+Ordering service shared by the reorder views.
+
+Sections, section items and landing page sections all carry a `position`
+column. Reordering reads and validates the list with one query and writes
+every changed position with one bulk_update inside a transaction, so a
+request that dies halfway never leaves a partial ordering behind.
+
+Positions are sparse: rows are spaced POSITION_GAP apart, so moving a single
+row (move_after) normally writes only that row, at the midpoint between its
+new neighbours. Only when two neighbours have no gap left is the whole list
+rebalanced, in one bulk_update.
+"""
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .invalidation import invalidate_rows
+
+
+# Distance between neighbouring positions after a reorder or rebalance
+POSITION_GAP = 1024
+
+
+class OrderingError(ValueError):
+    """Raised when a submitted order is malformed or names unknown rows"""
+
+
+def next_position(queryset):
+    """Get the position for a row appended after every row in queryset"""
+    max_position = queryset.aggregate(max_pos=Max('position'))['max_pos']
+    return 0 if max_position is None else max_position + POSITION_GAP
+
+
+def parse_order(value):
+    """Parse a comma separated id list (or a list of ids) into a list of ints"""
+    if isinstance(value, str):
+        value = [part for part in value.split(',') if part.strip()]
+    try:
+        ids = [int(part) for part in value]
+    except (TypeError, ValueError):
+        raise OrderingError("Order must be a list of integer ids")
+    if len(set(ids)) != len(ids):
+        raise OrderingError("Order contains duplicate ids")
+    return ids
+
+
+def apply_order(queryset, order):
+    """
+    Put the rows of `queryset` named in `order` in that order.
+
+    `queryset` scopes which rows may be reordered (e.g. the items of one
+    section). The named rows are reordered among the places they already
+    hold, so a subset moves between its existing neighbours and rows left
+    out keep their place; naming every row orders the whole list. The list
+    is then evenly respaced, writing only the rows whose position changed.
+    Raises OrderingError if any id is not in that scope. Returns the ids in
+    their new order.
+    """
+    ids = parse_order(order)
+    if not ids:
+        return ids
+
+    model = queryset.model
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().order_by('position', 'id'))
+        by_id = {row.id: row for row in rows}
+        missing = [row_id for row_id in ids if row_id not in by_id]
+        if missing:
+            raise OrderingError(f"Unknown ids: {', '.join(str(row_id) for row_id in missing)}")
+
+        # Fill the places of the named rows with them, in the submitted order
+        submitted = iter(ids)
+        named = set(ids)
+        ordered = [by_id[next(submitted)] if row.id in named else row for row in rows]
+
+        changed = []
+        for index, row in enumerate(ordered):
+            position = index * POSITION_GAP
+            if row.position != position:
+                row.position = position
+                changed.append(row)
+
+        if changed:
+            # bulk_update bypasses post_save and auto_now, so handle both here
+            model.objects.bulk_update(changed, _position_fields(changed))
+            invalidate_rows(changed)
+
+    return ids
+
+
+def move_after(queryset, row_id, after_id=None):
+    """
+    Move one row of `queryset` directly after another (or first if after_id is None).
+
+    Writes only the moved row when there is room between its new neighbours,
+    otherwise rebalances the whole list in one bulk_update. Raises
+    OrderingError if after_id is not an integer or either id is not in the
+    queryset. Returns the moved row.
+    """
+    if after_id is not None:
+        try:
+            after_id = int(after_id)
+        except (TypeError, ValueError):
+            raise OrderingError("after_id must be an integer id or null")
+    with transaction.atomic():
+        rows = queryset.select_for_update()
+        try:
+            row = rows.get(id=row_id)
+            after = rows.get(id=after_id) if after_id is not None else None
+        except queryset.model.DoesNotExist:
+            raise OrderingError("Unknown id")
+        if after is not None and after.id == row.id:
+            raise OrderingError("Cannot move a row after itself")
+
+        # Find the row that will follow the moved one
+        others = rows.exclude(id=row.id).order_by('position', 'id')
+        if after is None:
+            before = others.first()
+        else:
+            before = others.filter(
+                Q(position__gt=after.position) | Q(position=after.position, id__gt=after.id)
+            ).first()
+
+        lower = after.position if after is not None else None
+        upper = before.position if before is not None else None
+        if lower is None and upper is None:
+            position = 0
+        elif lower is None:
+            position = upper - POSITION_GAP
+        elif upper is None:
+            position = lower + POSITION_GAP
+        elif upper - lower >= 2:
+            position = (lower + upper) // 2
+        else:
+            return _rebalance(others, row, after)
+
+        row.position = position
+        row.save(update_fields=_position_fields([row]))
+    return row
+
+
+def _rebalance(others, row, after):
+    # Respace the whole list with the moved row placed after `after`
+    ordered = list(others)
+    index = 0 if after is None else [other.id for other in ordered].index(after.id) + 1
+    ordered.insert(index, row)
+
+    for index, other in enumerate(ordered):
+        other.position = index * POSITION_GAP
+    row.__class__.objects.bulk_update(ordered, _position_fields(ordered))
+    invalidate_rows(ordered)
+    return row
+
+
+def _position_fields(rows):
+    # Fields to write for a position change, stamping updated_at (which
+    # bulk_update and update_fields would otherwise leave untouched) on
+    # models that track it
+    fields = ['position']
+    if any(field.name == 'updated_at' for field in rows[0]._meta.fields):
+        now = timezone.now()
+        for row in rows:
+            row.updated_at = now
+        fields.append('updated_at')
+    return fields
@@ -0,0 +1,117 @@
+"""
+Keyset (cursor) pagination for the catalogue endpoints.
+
+Instead of OFFSET, each page continues strictly after the last row of the
+previous page using a (sort value, id) pair, so fetching page 1000 costs the
+same as fetching page 1. The cursor handed to clients is an opaque base64
+encoding of that pair.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Supported orderings: name -> (sort field, descending)
+ORDERINGS = {
+    'title': ('title', False),
+    'created': ('created_at', True),
+    'updated': ('updated_at', False),
+    'deleted': ('deleted_at', False),
+}
+
+# Sort fields whose cursor values are datetimes
+DATETIME_FIELDS = ('created_at', 'updated_at', 'deleted_at')
+
+
+class PaginationError(ValueError):
+    """Raised for an invalid cursor, ordering or page size"""
+
+
+def get_page_size(value):
+    """Parse and clamp a requested page size"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if page_size < 1:
+        raise PaginationError("limit must be positive")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def paginate(queryset, ordering='title', cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return (rows, next_cursor) for one page of a queryset.
+
+    next_cursor is None on the last page.
+    """
+    page = page_queryset(queryset, ordering, cursor, page_size)
+    return split_page(list(page), ordering, page_size)
+
+
+async def apaginate(queryset, ordering='title', cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Async version of paginate()"""
+    page = page_queryset(queryset, ordering, cursor, page_size)
+    return split_page([row async for row in page], ordering, page_size)
+
+
+def page_queryset(queryset, ordering, cursor, page_size):
+    """Order and filter a queryset down to one page (plus one look-ahead row)"""
+    if ordering not in ORDERINGS:
+        raise PaginationError(f"ordering must be one of: {', '.join(ORDERINGS)}")
+    field, descending = ORDERINGS[ordering]
+
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-id')
+    else:
+        queryset = queryset.order_by(field, 'id')
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, ordering)
+        if descending:
+            after = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': last_id})
+        else:
+            after = Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': last_id})
+        queryset = queryset.filter(after)
+
+    # Fetch one extra row to find out whether there is a next page
+    return queryset[:page_size + 1]
+
+
+def split_page(rows, ordering, page_size):
+    """Split fetched rows into (rows, next_cursor)"""
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(ordering, getattr(last, ORDERINGS[ordering][0]), last.id)
+
+
+def encode_cursor(ordering, value, last_id):
+    """Encode the position after a row as an opaque cursor"""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    payload = json.dumps([ordering, value, last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, ordering):
+    """Decode a cursor into (sort value, id) for the given ordering"""
+    try:
+        cursor_ordering, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise PaginationError("Invalid cursor")
+    if cursor_ordering != ordering or not isinstance(last_id, int):
+        raise PaginationError("Cursor does not match the requested ordering")
+
+    if ORDERINGS[ordering][0] in DATETIME_FIELDS:
+        value = parse_datetime(value) if isinstance(value, str) else None
+        if value is None:
+            raise PaginationError("Invalid cursor")
+    return value, last_id
@@ -0,0 +1,255 @@
+"""
+Rule-based automatic sections.
+
+Instead of a single auto_genre, an automatic section can pick its content
+with a rule stored in settings['rules']. Every key is optional:
+
+    {
+        "genres": [3, 7],         genre ids
+        "genre_match": "any",     "any" (default) or "all" of the genres
+        "year": [2015, null],     release year range, inclusive
+        "duration": [null, 120],  duration range in minutes, inclusive;
+                                  only movies have a duration
+        "types": ["movie"],       "movie" and/or "series"
+        "sort": "newest",         one of SORT_KEYS
+        "limit": 20,
+        "offset": 0
+    }
+
+compile_rule() validates a rule into a hashable Rule, and rule_queryset()
+turns that into a single ContentCard query. Its cost is bounded by the walk:
+the ids of the first MAX_RULE_WALK candidates in the requested order, read
+off one index (see walk_queryset()):
+
+    - newest/oldest with one genre, or with "all" of several: the first
+      genre's GenreMembership list, read off its (genre, created_at, card)
+      index
+    - anything else: the ContentCard index of the sort key
+
+The remaining genres are probed on the (genre, card) unique index, year,
+duration and type are checked on the walked rows, and the matches are
+sorted and sliced. compile_rule() also rejects sort keys without an index
+and caps the limit, the offset and the number of genres.
+
+A rule that matches few of its walked rows (a rare genre sorted by title,
+say) shows fewer cards than it asks for, so check_rule_cost() rejects it
+when it is saved.
+"""
+from collections import namedtuple
+
+from django.db.models import Exists, OuterRef
+
+from .models import ContentCard, GenreMembership, Section
+
+Rule = namedtuple('Rule', ['genres', 'genre_match', 'year', 'duration', 'types', 'sort', 'limit', 'offset'])
+
+# Orderings with a ContentCard index behind them (see ContentCard.Meta)
+SORT_KEYS = {
+    'newest': ('-created_at', '-id'),
+    'oldest': ('created_at', 'id'),
+    'title': ('title', 'id'),
+    'latest_release': ('-release_year', '-id'),
+}
+
+# Sort keys that match the order of the GenreMembership lists
+MEMBERSHIP_SORT_KEYS = {
+    'newest': ('-created_at', '-card_id'),
+    'oldest': ('created_at', 'card_id'),
+}
+
+GENRE_MATCHES = ('any', 'all')
+CONTENT_TYPES = ('movie', 'series')
+RULE_KEYS = set(Rule._fields)
+
+# Each genre costs an index probe per row walked, so few are allowed
+MAX_RULE_GENRES = 10
+
+# Most rows of a sort index (or membership list) a rule walks
+MAX_RULE_WALK = 2000
+
+
+class RuleError(ValueError):
+    """Raised when a section rule is malformed or exceeds the rule limits"""
+
+
+def compile_rule(rules):
+    """Validate settings['rules'] into a Rule; raises RuleError"""
+    if not isinstance(rules, dict):
+        raise RuleError("rules must be an object")
+    unknown = set(rules) - RULE_KEYS
+    if unknown:
+        raise RuleError(f"Unknown rule keys: {', '.join(sorted(unknown))}")
+
+    genres = tuple(sorted({_integer(genre, "genres must be a list of genre ids") for genre in _list(rules.get('genres'), 'genres')}))
+    if len(genres) > MAX_RULE_GENRES:
+        raise RuleError(f"A rule can use at most {MAX_RULE_GENRES} genres")
+
+    genre_match = rules.get('genre_match') or 'any'
+    if genre_match not in GENRE_MATCHES:
+        raise RuleError(f"genre_match must be one of: {', '.join(GENRE_MATCHES)}")
+
+    types = tuple(sorted(set(_list(rules.get('types'), 'types')))) or CONTENT_TYPES
+    if not set(types) <= set(CONTENT_TYPES):
+        raise RuleError(f"types must be a list of: {', '.join(CONTENT_TYPES)}")
+
+    duration = _range(rules.get('duration'), 'duration')
+    if duration is not None:
+        if 'movie' not in types:
+            raise RuleError("duration only applies to movies")
+        types = ('movie',)
+
+    sort = rules.get('sort') or 'newest'
+    if sort not in SORT_KEYS:
+        raise RuleError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+
+    limit = _integer(rules.get('limit', Section.AUTO_CONTENT_LIMIT), "limit must be an integer")
+    if not 1 <= limit <= Section.MAX_AUTO_CONTENT_LIMIT:
+        raise RuleError(f"limit must be between 1 and {Section.MAX_AUTO_CONTENT_LIMIT}")
+    offset = _integer(rules.get('offset', 0), "offset must be an integer")
+    if not 0 <= offset <= Section.MAX_AUTO_CONTENT_OFFSET:
+        raise RuleError(f"offset must be between 0 and {Section.MAX_AUTO_CONTENT_OFFSET}")
+
+    return Rule(
+        genres=genres,
+        # "any" and "all" of a single genre are the same rule
+        genre_match=genre_match if len(genres) > 1 else 'any',
+        year=_range(rules.get('year'), 'year'),
+        duration=duration,
+        types=types,
+        sort=sort,
+        limit=limit,
+        offset=offset,
+    )
+
+
+def rule_queryset(rule):
+    """Compile a Rule into one sliced ContentCard queryset"""
+    cards = ContentCard.objects.filter(pk__in=walk_queryset(rule))
+    genres = list(rule.genres)
+    if _walks_membership(rule):
+        # The walk already keeps to the first genre
+        genres.pop(0)
+
+    if genres and rule.genre_match == 'all':
+        for genre_id in genres:
+            cards = cards.filter(Exists(GenreMembership.objects.filter(genre_id=genre_id, card_id=OuterRef('pk'))))
+    elif genres:
+        cards = cards.filter(Exists(GenreMembership.objects.filter(genre_id__in=genres, card_id=OuterRef('pk'))))
+
+    if rule.types != CONTENT_TYPES:
+        cards = cards.filter(kind__in=rule.types)
+    cards = _filter_range(cards, 'release_year', rule.year)
+    cards = _filter_range(cards, 'duration_minutes', rule.duration)
+
+    return cards.order_by(*SORT_KEYS[rule.sort])[rule.offset:rule.offset + rule.limit]
+
+
+def walk_queryset(rule):
+    """The ids of the first MAX_RULE_WALK cards a Rule looks at, in its sort order"""
+    if _walks_membership(rule):
+        # Memberships carry their card's created_at, so the orders agree
+        walk = GenreMembership.objects.filter(genre_id=rule.genres[0]).order_by(
+            *MEMBERSHIP_SORT_KEYS[rule.sort]
+        ).values('card_id')
+    else:
+        walk = ContentCard.objects.order_by(*SORT_KEYS[rule.sort]).values('pk')
+    return walk[:MAX_RULE_WALK]
+
+
+def check_rule_cost(rule):
+    """
+    Reject a Rule that cannot fill its page within its walk; raises RuleError.
+
+    Such a rule would show fewer cards than asked for (or none) even though
+    more matching content exists further down its sort order.
+    """
+    if rule_queryset(rule).count() == rule.limit:
+        return
+    if walk_queryset(rule).count() < MAX_RULE_WALK:
+        # The walk covers everything the rule could select
+        return
+    raise RuleError(
+        f"Too few of the first {MAX_RULE_WALK} cards in '{rule.sort}' order match this rule; "
+        "sort it by newest or oldest within a genre, or loosen its filters"
+    )
+
+
+def _walks_membership(rule):
+    """Whether a Rule walks its first genre's membership list rather than every card"""
+    return bool(rule.genres) and rule.sort in MEMBERSHIP_SORT_KEYS and (
+        len(rule.genres) == 1 or rule.genre_match == 'all'
+    )
+
+
+def select_cards(rule):
+    """Get the cards a Rule selects"""
+    return list(rule_queryset(rule))
+
+
+async def aselect_cards(rule):
+    """Async version of select_cards()"""
+    return [card async for card in rule_queryset(rule)]
+
+
+def rule_sections(genre_ids, include_genreless=False):
+    """
+    Get ids of the rule-based sections that filter on any of these genres.
+    
+    With include_genreless, rules that do not filter on genre at all (and
+    so can show any content) are included too.
+    """
+    genre_ids = set(genre_ids)
+    section_ids = set()
+    if not genre_ids and not include_genreless:
+        return section_ids
+    for section_id, settings in Section.objects.filter(
+        content_selection_type='automatic', settings__has_key='rules'
+    ).values_list('id', 'settings'):
+        try:
+            rule = compile_rule(settings['rules'])
+        except RuleError:
+            # Shows nothing, so it cannot go stale either
+            continue
+        if genre_ids.intersection(rule.genres) or (include_genreless and not rule.genres):
+            section_ids.add(section_id)
+    return section_ids
+
+
+def _filter_range(cards, field, bounds):
+    if bounds is None:
+        return cards
+    low, high = bounds
+    if low is not None:
+        cards = cards.filter(**{f'{field}__gte': low})
+    if high is not None:
+        cards = cards.filter(**{f'{field}__lte': high})
+    return cards
+
+
+def _list(value, name):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise RuleError(f"{name} must be a list")
+    return value
+
+
+def _integer(value, message):
+    # bool is an int subclass, but true/false is never a meaningful number here
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RuleError(message)
+    return value
+
+
+def _range(value, name):
+    """Parse [min, max] (either may be null) into a tuple, or None for no bounds"""
+    if value is None:
+        return None
+    if not isinstance(value, list) or len(value) != 2:
+        raise RuleError(f"{name} must be a [min, max] pair")
+    low, high = (None if bound is None else _integer(bound, f"{name} bounds must be integers or null") for bound in value)
+    if low is None and high is None:
+        return None
+    if low is not None and high is not None and low > high:
+        raise RuleError(f"{name} minimum is greater than its maximum")
+    return low, high
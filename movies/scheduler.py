@@ -0,0 +1,166 @@
+"""
+Section resolution scheduler for page builds.
+
+Resolving sections one after another makes a page with fifteen automatic
+carousels pay for thirty sequential queries. The scheduler looks at every
+section being built, plans the distinct queries they need up front and runs
+them in one of two modes (settings.SECTION_RESOLUTION_MODE):
+
+    merged   All manual sections are loaded with one query and all
+             genre sections with another, a UNION ALL of one LIMITed range
+             scan per feed over the genre's membership list. Rule-based
+             sections (movies/rules.py) add one query per distinct rule.
+
+    threads  Each distinct feed, and the manual sections together, run
+             as separate tasks on a bounded thread pool. Every thread
+             uses its own database connection and closes it when its task
+             is done, so page latency tracks the slowest section instead of
+             the sum of all sections.
+
+Either way, each section ends up with its content prefetched and
+Section.get_content() does not touch the database while rendering.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Value
+
+from .models import ContentCard, prefetch_section_content, read_feed
+from .rules import Rule
+
+MODES = ('merged', 'threads')
+DEFAULT_WORKERS = 8
+
+# Genre feeds read by one UNION ALL query; SQLite allows 500 compound terms
+MAX_FEEDS_PER_QUERY = 100
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def resolve_sections(sections, mode=None):
+    """Prefetch the content of sections using the configured resolution mode"""
+    mode = mode or getattr(settings, 'SECTION_RESOLUTION_MODE', 'merged')
+    if mode not in MODES:
+        raise ValueError(f"SECTION_RESOLUTION_MODE must be one of: {', '.join(MODES)}")
+
+    manual_sections = [s for s in sections if s.content_selection_type == 'manual']
+    feeds = plan_feeds(sections)
+
+    if mode == 'merged' or len(feeds) + bool(manual_sections) <= 1:
+        # Nothing to run side by side; a pool would only add overhead
+        prefetch_section_content(manual_sections)
+        resolved = resolve_feeds_merged(feeds)
+    else:
+        resolved = resolve_feeds_threaded(feeds, manual_sections)
+
+    for feed, feed_sections in feeds.items():
+        for section in feed_sections:
+            section._prefetched_content = resolved[feed]
+
+
+def plan_feeds(sections):
+    """
+    Group automatic sections by the feed they show.
+
+    Returns {feed: [sections]}, keyed by Section.get_feed(), so sections
+    showing the same window of the same genre, or the same rule, are
+    resolved once. Sections with nothing to show get no content right away.
+    """
+    feeds = defaultdict(list)
+    for section in sections:
+        if section.content_selection_type == 'automatic':
+            feed = section.get_feed()
+            if feed is None:
+                section._prefetched_content = []
+            else:
+                feeds[feed].append(section)
+    return feeds
+
+
+def resolve_feeds_merged(feeds):
+    """Resolve all genre feeds with one UNION ALL query, and each rule feed with its own"""
+    resolved = {feed: read_feed(feed) for feed in feeds if isinstance(feed, Rule)}
+    genre_feeds = [feed for feed in feeds if not isinstance(feed, Rule)]
+    for start in range(0, len(genre_feeds), MAX_FEEDS_PER_QUERY):
+        resolved.update(newest_in_genres(genre_feeds[start:start + MAX_FEEDS_PER_QUERY]))
+    return resolved
+
+
+def newest_in_genres(genre_feeds):
+    """
+    Get the cards of many (genre_id, limit, offset) feeds with one query.
+
+    Returns {feed: [card, ...]}, each list newest first like
+    newest_in_genre().
+    """
+    by_feed = {feed: [] for feed in genre_feeds}
+    feeds = [feed for feed in genre_feeds if feed[1] > 0]
+    if not feeds:
+        return by_feed
+
+    sql, params = genre_feeds_query(feeds)
+    for card in ContentCard.objects.raw(sql, params):
+        by_feed[feeds[card.feed]].append(card)
+    for cards in by_feed.values():
+        # UNION ALL does not promise to keep each branch's order; a card's
+        # created_at and id are the membership list's sort key
+        cards.sort(key=lambda card: (card.created_at, card.id), reverse=True)
+    return by_feed
+
+
+def genre_feeds_query(genre_feeds):
+    """
+    SQL and params of the query reading many genre feeds.
+
+    Each feed is its own range scan over the genre's (genre, created_at,
+    card) membership index, cut to the feed's window with LIMIT, and the
+    scans are joined with UNION ALL. The cost is the sum of the windows
+    however large the genres are. Rows carry the number of their feed.
+    """
+    parts, params = [], []
+    for number, (genre_id, limit, offset) in enumerate(genre_feeds):
+        cards = ContentCard.objects.filter(memberships__genre_id=genre_id).annotate(
+            feed=Value(number)
+        ).order_by('-memberships__created_at', '-memberships__card_id')[offset:offset + limit]
+        feed_sql, feed_params = cards.query.sql_with_params()
+        # LIMIT is only allowed in a subquery of a compound SELECT
+        parts.append(f'SELECT * FROM ({feed_sql})')
+        params.extend(feed_params)
+    return ' UNION ALL '.join(parts), params
+
+
+def resolve_feeds_threaded(feeds, manual_sections=()):
+    """Resolve each feed, and the manual sections, as a task on the thread pool"""
+    executor = get_executor()
+    manual = executor.submit(_in_own_connection, prefetch_section_content, manual_sections)
+    futures = {
+        feed: executor.submit(_in_own_connection, read_feed, feed)
+        for feed in feeds
+    }
+
+    manual.result()
+    return {feed: future.result() for feed, future in futures.items()}
+
+
+def get_executor():
+    """Get the shared, bounded thread pool used by the threads mode"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'SECTION_RESOLUTION_WORKERS', DEFAULT_WORKERS)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='section-resolver')
+    return _executor
+
+
+def _in_own_connection(func, *args):
+    # Django connections are per thread; close this thread's one when the
+    # task is done so idle pool threads do not hold connections open
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
@@ -0,0 +1,201 @@
+"""
+Full-text search over movies and series for the content pickers.
+
+/api/search/ matches every word of the query against the title and
+description of the content cards, the last word as a prefix so results
+follow the editor's typing. Results can be filtered by genre, type and
+release year, and come back ranked and paginated.
+
+The search itself is done by a backend, named by settings.SEARCH_BACKEND
+as a dotted path so deployments can plug in another engine:
+
+    FTS5SearchBackend    The SQLite FTS5 index movies_contentcard_fts, kept
+                         in step with ContentCard by triggers (migration
+                         0009). Matches are ranked with bm25, title hits
+                         above description hits, and every word is matched
+                         through the index, so the cost follows the number
+                         of matches rather than the size of the catalogue.
+    BasicSearchBackend   icontains matching for other databases, ranking
+                         title prefix matches first. It scans the cards, so
+                         it is only meant for small catalogues.
+
+Without the setting, FTS5 is used when its index exists and the basic
+backend otherwise.
+"""
+from collections import namedtuple
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.module_loading import import_string
+
+from .models import ContentCard, GenreMembership
+
+SearchQuery = namedtuple('SearchQuery', ['terms', 'genre_id', 'kind', 'year_from', 'year_to', 'limit', 'offset'])
+
+FTS5_BACKEND = 'movies.search.FTS5SearchBackend'
+BASIC_BACKEND = 'movies.search.BasicSearchBackend'
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Ranked results have no cheap keyset, so deep pages are refused
+MAX_OFFSET = 1000
+
+# Words beyond this are ignored, and prefixes shorter than this only match
+# whole words, so the first keystrokes do not match half the catalogue
+MAX_TERMS = 8
+MIN_PREFIX_LENGTH = 3
+
+CONTENT_TYPES = ('movie', 'series')
+WORD_RE = re.compile(r'\w+')
+
+_backend = None
+
+
+class SearchError(ValueError):
+    """Raised for an empty query or invalid search parameters"""
+
+
+def parse_search(params):
+    """Build a SearchQuery from request parameters (q, genre, type, year, year_from, year_to, limit, offset)"""
+    terms = tuple(WORD_RE.findall(params.get('q', '').lower()))[:MAX_TERMS]
+    if not terms:
+        raise SearchError("q must contain at least one word")
+
+    kind = params.get('type') or None
+    if kind is not None and kind not in CONTENT_TYPES:
+        raise SearchError(f"type must be one of: {', '.join(CONTENT_TYPES)}")
+
+    year = _integer(params, 'year')
+    year_from = year if year is not None else _integer(params, 'year_from')
+    year_to = year if year is not None else _integer(params, 'year_to')
+
+    limit = _integer(params, 'limit', DEFAULT_LIMIT)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise SearchError(f"limit must be between 1 and {MAX_LIMIT}")
+    offset = _integer(params, 'offset', 0)
+    if not 0 <= offset <= MAX_OFFSET:
+        raise SearchError(f"offset must be between 0 and {MAX_OFFSET}")
+
+    return SearchQuery(
+        terms=terms,
+        genre_id=_integer(params, 'genre'),
+        kind=kind,
+        year_from=year_from,
+        year_to=year_to,
+        limit=limit,
+        offset=offset,
+    )
+
+
+def search(query):
+    """
+    Run a SearchQuery with the configured backend.
+
+    Returns (cards, next_offset); next_offset is None on the last page.
+    """
+    # Fetch one extra card to find out whether there is a next page
+    cards = get_backend().search(query, query.limit + 1)
+    next_offset = query.offset + query.limit if len(cards) > query.limit else None
+    return cards[:query.limit], next_offset
+
+
+def get_backend():
+    """Get the search backend named by settings.SEARCH_BACKEND, or the best available one"""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path is None:
+            path = FTS5_BACKEND if FTS5SearchBackend.is_available() else BASIC_BACKEND
+        _backend = import_string(path)()
+    return _backend
+
+
+class FTS5SearchBackend:
+    """Search the SQLite FTS5 index over ContentCard (see migration 0009)"""
+    table = 'movies_contentcard_fts'
+    # bm25 weights of the indexed columns: title, description
+    weights = (10.0, 1.0)
+
+    @classmethod
+    def is_available(cls):
+        return connection.vendor == 'sqlite' and cls.table in connection.introspection.table_names()
+
+    def search(self, query, limit):
+        cards = ContentCard._meta.db_table
+        where = [f'{self.table} MATCH %s']
+        params = [self.match_expression(query.terms)]
+
+        if query.kind is not None:
+            where.append(f'{cards}.kind = %s')
+            params.append(query.kind)
+        if query.year_from is not None:
+            where.append(f'{cards}.release_year >= %s')
+            params.append(query.year_from)
+        if query.year_to is not None:
+            where.append(f'{cards}.release_year <= %s')
+            params.append(query.year_to)
+        if query.genre_id is not None:
+            # A probe of the (genre, card) unique index per match
+            where.append(
+                f'EXISTS (SELECT 1 FROM {GenreMembership._meta.db_table} membership '
+                f'WHERE membership.genre_id = %s AND membership.card_id = {cards}.id)'
+            )
+            params.append(query.genre_id)
+
+        weights = ', '.join(str(weight) for weight in self.weights)
+        sql = (
+            f'SELECT {cards}.* FROM {self.table} '
+            f'JOIN {cards} ON {cards}.id = {self.table}.rowid '
+            f'WHERE {" AND ".join(where)} '
+            f'ORDER BY bm25({self.table}, {weights}), {cards}.id '
+            f'LIMIT %s OFFSET %s'
+        )
+        params += [limit, query.offset]
+        return list(ContentCard.objects.raw(sql, params))
+
+    def match_expression(self, terms):
+        """FTS5 query matching every term, the last one as a prefix"""
+        # Terms are \w+ words, so quoting them is enough to escape them
+        phrases = [f'"{term}"' for term in terms]
+        if len(terms[-1]) >= MIN_PREFIX_LENGTH:
+            phrases[-1] += '*'
+        return ' '.join(phrases)
+
+
+class BasicSearchBackend:
+    """Search ContentCard with icontains, for databases without a full-text index"""
+
+    def search(self, query, limit):
+        cards = ContentCard.objects.all()
+        for term in query.terms:
+            cards = cards.filter(Q(title__icontains=term) | Q(description__icontains=term))
+
+        if query.kind is not None:
+            cards = cards.filter(kind=query.kind)
+        if query.year_from is not None:
+            cards = cards.filter(release_year__gte=query.year_from)
+        if query.year_to is not None:
+            cards = cards.filter(release_year__lte=query.year_to)
+        if query.genre_id is not None:
+            cards = cards.filter(memberships__genre_id=query.genre_id)
+
+        phrase = ' '.join(query.terms)
+        cards = cards.annotate(rank=Case(
+            When(title__istartswith=phrase, then=Value(0)),
+            When(title__icontains=phrase, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        ))
+        return list(cards.order_by('rank', 'title', 'id')[query.offset:query.offset + limit])
+
+
+def _integer(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise SearchError(f"{name} must be an integer")
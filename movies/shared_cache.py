@@ -0,0 +1,53 @@
+"""
+Whether the default cache is shared between processes.
+
+Snapshots, fragments, version counters, watermarks, the active page pointer
+and the single-flight locks only coordinate processes through a cache every
+process sees (settings.CACHES). With a process-local backend such as
+LocMemCache, a write or activation made by another worker or a management
+command never reaches this process's copy, so:
+
+    - the active page pointer is read from the database instead
+    - everything else is stored for at most PROCESS_LOCAL_TIMEOUT seconds,
+      which bounds how long another process's write can go unseen
+
+and the movies.W001 system check warns about the configuration.
+"""
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+# Longest anything is cached for when the cache is process-local
+PROCESS_LOCAL_TIMEOUT = 60
+
+
+def is_shared():
+    """Whether the default cache is seen by every process"""
+    return not isinstance(caches['default'], PROCESS_LOCAL_BACKENDS)
+
+
+def timeout(shared_timeout):
+    """Cache timeout for an entry: shared_timeout, capped when the cache is process-local"""
+    if is_shared():
+        return shared_timeout
+    if shared_timeout is None:
+        return PROCESS_LOCAL_TIMEOUT
+    return min(shared_timeout, PROCESS_LOCAL_TIMEOUT)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared():
+        return []
+    return [checks.Warning(
+        "The default cache is process-local, so page caches are not shared between processes.",
+        hint=(
+            "Configure a shared backend (Redis, Memcached or the database cache) in "
+            "settings.CACHES. Until then the active page is read from the database and "
+            f"cached pages may be up to {PROCESS_LOCAL_TIMEOUT}s stale in other processes."
+        ),
+        id='movies.W001',
+    )]
@@ -0,0 +1,228 @@
+"""
+Signal receivers that keep cached page fragments in sync with the database.
+
+Each receiver works out which sections or landing pages a write feeds (see
+movies/invalidation.py) and evicts only those.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (
+    Movie, Series, Genre, Section, SectionItem,
+    LandingPage, LandingPageSection, Tombstone
+)
+from .invalidation import (
+    invalidate_landing_pages, invalidate_sections,
+    sections_for_content, sections_for_genres
+)
+from .active_page import refresh_active_page
+from . import cards
+from . import typeahead
+from . import watermarks
+
+
+def touch_table(sender, **kwargs):
+    """Bump the change watermark of the written table"""
+    watermarks.touch(watermarks.table_name(sender))
+
+
+for model in (Movie, Series, Genre, Section, SectionItem, LandingPage, LandingPageSection):
+    post_save.connect(touch_table, sender=model)
+    post_delete.connect(touch_table, sender=model)
+
+
+def stamp_updated(model, object_ids):
+    """Mark movies or series as changed for incremental sync, which reports their genres"""
+    object_ids = list(object_ids)
+    if object_ids:
+        model.objects.filter(pk__in=object_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=Series)
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=SectionItem)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    """
+    Record deletions for the incremental sync endpoints.
+
+    One row at a time; bulk delete paths record theirs with
+    Tombstone.record() and delete without per-row signals.
+    """
+    if sender is SectionItem and isinstance(origin, Section):
+        # Deleted along with their section, and recorded in bulk by section_deleted()
+        return
+    Tombstone.record(sender, [instance.pk])
+
+
+@receiver(pre_delete, sender=Section)
+def section_deleting(sender, instance, **kwargs):
+    instance._item_ids = list(instance.sectionitem_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Section)
+def section_deleted(sender, instance, **kwargs):
+    Tombstone.record(SectionItem, getattr(instance, '_item_ids', ()))
+
+
+# Receivers run in the order they are connected. Cards and genre lists are
+# brought up to date before sections are invalidated, or a page rebuilt in
+# between would cache the old content under the new fragment version
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=Series)
+def content_card_saved(sender, instance, **kwargs):
+    cards.sync_card(instance)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=Series)
+def content_saved(sender, instance, created, **kwargs):
+    if created:
+        # New content has no genres or section items yet, but rules that
+        # do not filter on genre can show it straight away
+        invalidate_sections(sections_for_genres((), include_genreless=True))
+    else:
+        invalidate_sections(sections_for_content(instance))
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=Series)
+def content_card_deleted(sender, instance, **kwargs):
+    cards.delete_card(instance)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=Series)
+def typeahead_content_saved(sender, instance, **kwargs):
+    """Keep this process's typeahead index current once the write commits"""
+    kind, object_id, title = instance.get_content_type(), instance.pk, instance.title
+    transaction.on_commit(lambda: typeahead.content_saved(kind, object_id, title))
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=Series)
+def typeahead_content_deleted(sender, instance, **kwargs):
+    kind, object_id = instance.get_content_type(), instance.pk
+    transaction.on_commit(lambda: typeahead.content_deleted(kind, object_id))
+
+
+@receiver(pre_save, sender=SectionItem)
+def section_item_card(sender, instance, update_fields=None, **kwargs):
+    """Point the item at the card of its content"""
+    if update_fields is not None and not {'content_type', 'object_id'} & set(update_fields):
+        return
+    instance.card_id = cards.card_id_for(instance.content_type_id, instance.object_id)
+
+
+@receiver(pre_delete, sender=Movie)
+@receiver(pre_delete, sender=Series)
+def content_deleting(sender, instance, **kwargs):
+    # Genre links are gone by post_delete, so resolve dependencies now
+    instance._dependent_sections = sections_for_content(instance)
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=Series)
+def content_deleted(sender, instance, **kwargs):
+    invalidate_sections(getattr(instance, '_dependent_sections', ()))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Series.genres.through)
+def content_card_genres_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Keep card genre ids and genre membership lists in step with the genre links"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            cards.refresh_genres(type(instance), [instance.pk])
+        return
+
+    # genre.movies.add(...) and friends: pk_set holds content ids
+    content_column = f'{model.genres.field.m2m_field_name()}_id'
+    if action == 'pre_clear':
+        instance._cleared_content_ids = list(
+            sender.objects.filter(genre_id=instance.pk).values_list(content_column, flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        cards.refresh_genres(model, pk_set)
+    elif action == 'post_clear':
+        cards.refresh_genres(model, getattr(instance, '_cleared_content_ids', ()))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Series.genres.through)
+def content_genres_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            stamp_updated(type(instance), [instance.pk])
+        elif action == 'post_clear':
+            stamp_updated(model, getattr(instance, '_cleared_content_ids', ()))
+        else:
+            stamp_updated(model, pk_set)
+        content_model = model if reverse else type(instance)
+        watermarks.touch(watermarks.table_name(content_model))
+
+    if reverse:
+        # genre.movies.add(...) and friends: only this genre's sections change
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_sections(sections_for_genres([instance.pk]))
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_genre_ids = list(instance.genres.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_sections(sections_for_genres(pk_set))
+    elif action == 'post_clear':
+        invalidate_sections(sections_for_genres(getattr(instance, '_cleared_genre_ids', ())))
+
+
+@receiver(pre_delete, sender=Genre)
+def genre_deleting(sender, instance, **kwargs):
+    # Sections lose their auto_genre through a SET_NULL update, and genre
+    # links are deleted in bulk, neither of which sends a signal, so
+    # collect what depends on the genre here
+    instance._dependent_sections = sections_for_genres([instance.pk])
+    instance._dependent_content = {
+        Movie: list(instance.movies.values_list('id', flat=True)),
+        Series: list(instance.series.values_list('id', flat=True)),
+    }
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    for model, object_ids in getattr(instance, '_dependent_content', {}).items():
+        cards.refresh_genres(model, object_ids)
+        stamp_updated(model, object_ids)
+        watermarks.touch(watermarks.table_name(model))
+    invalidate_sections(getattr(instance, '_dependent_sections', ()))
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def section_changed(sender, instance, **kwargs):
+    invalidate_sections([instance.pk])
+
+
+@receiver(post_save, sender=SectionItem)
+@receiver(post_delete, sender=SectionItem)
+def section_item_changed(sender, instance, origin=None, **kwargs):
+    # Items deleted along with their section leave nothing to invalidate
+    # beyond the section itself (see section_changed())
+    if not isinstance(origin, Section):
+        invalidate_sections([instance.section_id])
+
+
+@receiver(post_save, sender=LandingPageSection)
+@receiver(post_delete, sender=LandingPageSection)
+def landing_page_section_changed(sender, instance, **kwargs):
+    invalidate_landing_pages([instance.landing_page_id])
+
+
+@receiver(post_save, sender=LandingPage)
+@receiver(post_delete, sender=LandingPage)
+def landing_page_changed(sender, instance, **kwargs):
+    # The page may have been activated or deactivated, so republish the
+    # active page pointer once the change is committed. The compiled page
+    # only depends on its LandingPageSection rows, so its snapshot stays valid.
+    transaction.on_commit(refresh_active_page)
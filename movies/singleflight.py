@@ -0,0 +1,116 @@
+"""
+Single-flight coalescing of expensive cache rebuilds.
+
+When a hot cache entry goes stale, every request that notices would rebuild
+it at once. single_flight() elects one caller per key to do the rebuild:
+within a process with a per-key threading.Lock (no cache round trip), and
+across workers with a lock entry created by cache.add(), which any shared
+cache backend (and LocMemCache within one process) performs atomically.
+Everybody else either serves the previous copy or waits for the leader
+with wait_for_flight().
+
+The cache lock expires after LOCK_TIMEOUT seconds, so a leader that dies
+mid-rebuild only holds other workers back until then.
+
+Coalescing across workers needs the shared backend from settings.CACHES.
+With a process-local cache (see movies/shared_cache.py) each process elects
+its own leader, so a miss is rebuilt at most once per process rather than
+once overall.
+"""
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+LOCK_KEY = 'single_flight:{key}'
+
+# Longest a rebuild may hold the cross-worker lock
+LOCK_TIMEOUT = 30
+
+# How long followers wait for a leader, and how often they check on it
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def single_flight(key):
+    """Try to become the one caller rebuilding key; yields True if this caller leads"""
+    local = _local_lock(key)
+    if not local.acquire(blocking=False):
+        yield False
+        return
+    try:
+        lock_key = LOCK_KEY.format(key=key)
+        token = uuid.uuid4().hex
+        if not cache.add(lock_key, token, LOCK_TIMEOUT):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _release(lock_key, token)
+    finally:
+        local.release()
+
+
+def wait_for_flight(key, timeout=WAIT_TIMEOUT):
+    """Wait until no caller is rebuilding key; returns False on timeout"""
+    deadline = time.monotonic() + timeout
+    local = _local_lock(key)
+    if not local.acquire(timeout=timeout):
+        return False
+    local.release()
+
+    lock_key = LOCK_KEY.format(key=key)
+    while cache.get(lock_key) is not None:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(POLL_INTERVAL)
+    return True
+
+
+@asynccontextmanager
+async def asingle_flight(key):
+    """Async version of single_flight(), using the cache lock only"""
+    lock_key = LOCK_KEY.format(key=key)
+    token = uuid.uuid4().hex
+    if not await cache.aadd(lock_key, token, LOCK_TIMEOUT):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        if await cache.aget(lock_key) == token:
+            await cache.adelete(lock_key)
+
+
+async def await_flight(key, timeout=WAIT_TIMEOUT):
+    """Async version of wait_for_flight()"""
+    deadline = time.monotonic() + timeout
+    lock_key = LOCK_KEY.format(key=key)
+    while await cache.aget(lock_key) is not None:
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(POLL_INTERVAL)
+    return True
+
+
+def _local_lock(key):
+    lock = _local_locks.get(key)
+    if lock is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(key, threading.Lock())
+    return lock
+
+
+def _release(lock_key, token):
+    # Only drop the lock if it is still ours; it may have expired and been
+    # taken over by another worker during a very slow rebuild
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
@@ -0,0 +1,186 @@
+"""
+Precompiled snapshots of landing pages.
+
+page_data used to rebuild the whole page tree on every request. The tree is
+now compiled once into an immutable, pre-serialized JSON blob that is stored
+in the cache together with a version number, one per landing page. Any write
+to the content that feeds a page bumps its version (see
+movies/invalidation.py), which makes the stored snapshot stale and forces
+the next read to rebuild it. Rebuilding only re-renders the sections whose
+cached fragments were evicted (see movies/fragments.py).
+
+The active page is found through the pointer in movies/active_page.py, so
+switching pages needs no invalidation, and a page can be compiled before it
+goes live.
+"""
+from collections import namedtuple
+import time
+
+from django.core.cache import cache
+
+from .active_page import aget_active_id, get_active_id
+from .fragments import aget_fragments, assemble_page, get_fragments
+from .models import LandingPageSection
+from .singleflight import asingle_flight, await_flight, single_flight, wait_for_flight
+from . import shared_cache, versions, watermarks
+
+# Every landing page write, activations included, bumps this watermark
+ACTIVATION_TABLES = ('landingpage',)
+
+SNAPSHOT_KEY = 'page_snapshot:{landing_page_id}'
+VERSION_KEY = 'page_snapshot:version:{landing_page_id}'
+
+# The version decides whether a snapshot is current; the timeout only stops
+# snapshots of pages nobody reads any more from being kept forever
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Immutable compiled page: the version it was built against, the landing page
+# it was built from, the encoded JSON body and when it was built (a Unix
+# timestamp, see last_modified()).
+PageSnapshot = namedtuple('PageSnapshot', ['version', 'landing_page_id', 'body', 'built_at'])
+
+
+def get_version(landing_page_id):
+    """Get the current snapshot version of a landing page, initialising it if needed"""
+    return versions.get_version(VERSION_KEY.format(landing_page_id=landing_page_id))
+
+
+def invalidate_snapshot(landing_page_ids):
+    """Bump the snapshot version of landing pages so they are rebuilt on next read"""
+    versions.bump_versions(VERSION_KEY.format(landing_page_id=landing_page_id) for landing_page_id in landing_page_ids)
+
+
+def get_snapshot(landing_page_id=None):
+    """
+    Return the compiled snapshot of a landing page (by default the active one).
+
+    When the stored snapshot is stale, one caller rebuilds it (see
+    movies/singleflight.py) while concurrent callers keep serving the stale
+    copy. Without any copy to serve, they wait for that caller instead of
+    all rebuilding the page at once.
+    """
+    if landing_page_id is None:
+        landing_page_id = get_active_id()
+    keys = _keys(landing_page_id)
+    snapshot, current = _read(cache.get_many(keys), keys)
+    if current:
+        return snapshot
+
+    with single_flight(keys[0]) as leader:
+        if leader:
+            # The previous leader may have finished just before we took over
+            fresh, current = _read(cache.get_many(keys), keys)
+            return fresh if current else rebuild_snapshot(landing_page_id)
+
+    if snapshot is not None:
+        # Stale while revalidate: the leader is rebuilding
+        return snapshot
+    if wait_for_flight(keys[0]):
+        fresh, current = _read(cache.get_many(keys), keys)
+        if fresh is not None:
+            return fresh
+    return rebuild_snapshot(landing_page_id)
+
+
+def rebuild_snapshot(landing_page_id):
+    """Compile a landing page and store the result in the cache"""
+    # Read the version before building, so a write that lands while we are
+    # building leaves the stored snapshot stale rather than silently lost
+    version = get_version(landing_page_id)
+    snapshot = PageSnapshot(version, landing_page_id, build_page(landing_page_id), int(time.time()))
+    cache.set(
+        SNAPSHOT_KEY.format(landing_page_id=landing_page_id), snapshot, shared_cache.timeout(SNAPSHOT_TIMEOUT)
+    )
+    return snapshot
+
+
+def last_modified(snapshot):
+    """
+    Get the Last-Modified time of the active page served from a snapshot.
+
+    A page that goes live may have been built before the page it replaces
+    (e.g. pre-warmed for a scheduled activation), so the time of the last
+    landing page write is taken too, and Last-Modified never goes back when
+    the active page changes.
+    """
+    return max(snapshot.built_at, watermarks.get_watermark(ACTIVATION_TABLES)[1])
+
+
+def build_page(landing_page_id):
+    """Build the encoded page body for a landing page from section fragments"""
+    # Get all sections for this landing page in order
+    sections = [
+        lp_section.section
+        for lp_section in LandingPageSection.objects.filter(
+            landing_page_id=landing_page_id
+        ).select_related('section').order_by('position')
+    ]
+    return assemble_page(get_fragments(sections))
+
+
+async def aget_version(landing_page_id):
+    """Async version of get_version()"""
+    return await versions.aget_version(VERSION_KEY.format(landing_page_id=landing_page_id))
+
+
+async def aget_snapshot(landing_page_id=None):
+    """Async version of get_snapshot()"""
+    if landing_page_id is None:
+        landing_page_id = await aget_active_id()
+    keys = _keys(landing_page_id)
+    snapshot, current = _read(await cache.aget_many(keys), keys)
+    if current:
+        return snapshot
+
+    async with asingle_flight(keys[0]) as leader:
+        if leader:
+            fresh, current = _read(await cache.aget_many(keys), keys)
+            return fresh if current else await arebuild_snapshot(landing_page_id)
+
+    if snapshot is not None:
+        return snapshot
+    if await await_flight(keys[0]):
+        fresh, current = _read(await cache.aget_many(keys), keys)
+        if fresh is not None:
+            return fresh
+    return await arebuild_snapshot(landing_page_id)
+
+
+async def arebuild_snapshot(landing_page_id):
+    """Async version of rebuild_snapshot()"""
+    version = await aget_version(landing_page_id)
+    snapshot = PageSnapshot(version, landing_page_id, await abuild_page(landing_page_id), int(time.time()))
+    await cache.aset(
+        SNAPSHOT_KEY.format(landing_page_id=landing_page_id), snapshot, shared_cache.timeout(SNAPSHOT_TIMEOUT)
+    )
+    return snapshot
+
+
+async def alast_modified(snapshot):
+    """Async version of last_modified()"""
+    return max(snapshot.built_at, (await watermarks.aget_watermark(ACTIVATION_TABLES))[1])
+
+
+async def abuild_page(landing_page_id):
+    """Async version of build_page()"""
+    sections = [
+        lp_section.section
+        async for lp_section in LandingPageSection.objects.filter(
+            landing_page_id=landing_page_id
+        ).select_related('section').order_by('position')
+    ]
+    return assemble_page(await aget_fragments(sections))
+
+
+def _read(cached, keys):
+    # (stored snapshot or None, whether it matches the current version)
+    snapshot = cached.get(keys[0])
+    version = cached.get(keys[1])
+    return snapshot, snapshot is not None and version is not None and snapshot.version == version
+
+
+def _keys(landing_page_id):
+    return [
+        SNAPSHOT_KEY.format(landing_page_id=landing_page_id),
+        VERSION_KEY.format(landing_page_id=landing_page_id),
+    ]
@@ -0,0 +1,114 @@
+"""
+Streaming JSON responses for large exports.
+
+JsonResponse needs the whole result list and the whole encoded string in
+memory at once. These helpers encode rows one at a time from an iterator and
+hand them to StreamingHttpResponse in small buffered chunks, so memory use
+stays flat no matter how many rows are exported.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Rows fetched per database round trip (server-side cursor on PostgreSQL)
+STREAM_CHUNK_SIZE = 2000
+
+# Encoded rows are buffered up to roughly this many bytes before being sent
+STREAM_BUFFER_SIZE = 64 * 1024
+
+_encoder = DjangoJSONEncoder()
+
+
+def wants_stream(request):
+    """Check whether the client asked for a streaming export"""
+    return (
+        request.GET.get('stream', '').lower() in ('1', 'true', 'yes')
+        or request.GET.get('format') == 'ndjson'
+    )
+
+
+def streaming_json_response(rows, ndjson=False):
+    """Stream an iterable of JSON-serializable rows as a JSON array or NDJSON"""
+    if ndjson:
+        return StreamingHttpResponse(_buffered(iter_ndjson(rows)), content_type='application/x-ndjson')
+    return StreamingHttpResponse(_buffered(iter_json_array(rows)), content_type='application/json')
+
+
+def stream_request(request, rows):
+    """Stream rows in the format requested by ?format= (json or ndjson)"""
+    return streaming_json_response(rows, ndjson=request.GET.get('format') == 'ndjson')
+
+
+def astream_request(request, rows):
+    """stream_request() for an async iterable of rows, served without a thread under ASGI"""
+    ndjson = request.GET.get('format') == 'ndjson'
+    pieces = aiter_ndjson(rows) if ndjson else aiter_json_array(rows)
+    return StreamingHttpResponse(
+        _abuffered(pieces), content_type='application/x-ndjson' if ndjson else 'application/json'
+    )
+
+
+def iter_json_array(rows):
+    """Encode rows as the pieces of a single JSON array"""
+    yield '['
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield _encoder.encode(row)
+        else:
+            yield ', ' + _encoder.encode(row)
+    yield ']'
+
+
+def iter_ndjson(rows):
+    """Encode rows as newline-delimited JSON"""
+    for row in rows:
+        yield _encoder.encode(row) + '\n'
+
+
+async def aiter_json_array(rows):
+    """Async version of iter_json_array()"""
+    yield '['
+    first = True
+    async for row in rows:
+        if first:
+            first = False
+            yield _encoder.encode(row)
+        else:
+            yield ', ' + _encoder.encode(row)
+    yield ']'
+
+
+async def aiter_ndjson(rows):
+    """Async version of iter_ndjson()"""
+    async for row in rows:
+        yield _encoder.encode(row) + '\n'
+
+
+def _buffered(pieces):
+    # Join small pieces so each chunk written to the socket is a useful size
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+async def _abuffered(pieces):
+    buffer = []
+    size = 0
+    async for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
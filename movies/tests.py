@@ -1,3 +1,1004 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+import json
+import re
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    ContentCard, Movie, Series, Section, SectionItem, LandingPage, LandingPageSection, LandingPageSchedule,
+    GenreMembership, Genre, Tombstone, newest_in_genre, resolve_section_items,
+)
+from . import active_page, cards, fragments, snapshot
+from .ordering import OrderingError, apply_order
+from .rules import RuleError, check_rule_cost, compile_rule, rule_queryset, select_cards
+from .scheduler import genre_feeds_query, resolve_feeds_merged, resolve_sections
+from .search import BasicSearchBackend, FTS5SearchBackend, parse_search
+from .snapshot import get_snapshot, rebuild_snapshot
+from .typeahead import TypeaheadIndex, database_watermark, normalize
+
+
+# Rows per table the planner is told about, and the average number of rows
+# sharing one value of each column (e.g. ~50 genres, ~1000 sections)
+SIMULATED_ROWS = 1000000
+ROWS_PER_VALUE = {
+    'genre_id': 20000,
+    'section_id': 1000,
+    'landing_page_id': 100,
+    'content_type_id': 500000,
+    'movie_id': 3,
+    'series_id': 3,
+    'object_id': 2,
+    'card_id': 3,
+    'release_year': 10000,
+}
+
+
+def create_content(model, title, **fields):
+    """Create a movie or series with placeholder images"""
+    return model.objects.create(
+        title=title, description=fields.pop('description', ''), poster_url='https://example.com/p.jpg',
+        background_image_url='https://example.com/b.jpg', **fields
+    )
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+    """
+    The hot read paths must stay index-driven at catalogue scale.
+
+    Statistics for 1M rows per table are written into sqlite_stat1 so the
+    planner chooses the plans it would on a large database, then each query
+    shape is checked for full table scans and sorts in a temporary b-tree.
+    """
+
+    tables = [
+        'movies_movie', 'movies_series', 'movies_movie_genres', 'movies_series_genres',
+        'movies_sectionitem', 'movies_landingpage', 'movies_landingpagesection',
+        'movies_genremembership', 'movies_contentcard',
+    ]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('DELETE FROM sqlite_stat1')
+            for table in self.tables:
+                cursor.execute('INSERT INTO sqlite_stat1 VALUES (%s, NULL, %s)', [table, str(SIMULATED_ROWS)])
+                cursor.execute(f'PRAGMA index_list({table})')
+                for index in cursor.fetchall():
+                    name, partial = index[1], index[4]
+                    cursor.execute(f'PRAGMA index_info({name})')
+                    columns = [column[2] for column in cursor.fetchall()]
+                    cursor.execute('INSERT INTO sqlite_stat1 VALUES (%s, %s, %s)', [
+                        table, name, self.index_stat(columns, partial),
+                    ])
+            # Make the planner reload the statistics
+            cursor.execute('ANALYZE sqlite_master')
+
+    def index_stat(self, columns, partial):
+        """sqlite_stat1 row for an index: row count, then rows per key prefix"""
+        rows = 1 if partial else SIMULATED_ROWS
+        stat = [rows]
+        per_prefix = rows
+        for column in columns:
+            per_prefix = max(1, per_prefix * ROWS_PER_VALUE.get(column, 1) // rows)
+            stat.append(per_prefix)
+        return ' '.join(str(value) for value in stat)
+
+    def assertIndexed(self, queryset, allow_sort=False, bounded_scans=0):
+        return self.assertPlanIndexed(queryset.explain(), allow_sort, bounded_scans)
+
+    def assertPlanIndexed(self, plan, allow_sort=False, bounded_scans=0):
+        """
+        Check a plan for full table scans and unindexed sorts.
+
+        Walking a whole index is as slow as scanning the table, so index scans
+        are only allowed where the caller knows a LIMIT stops them early, and
+        must number exactly bounded_scans.
+        """
+        full_scans = [
+            line for line in plan.splitlines()
+            if re.search(r'\bSCAN \w+$', line.strip())
+        ]
+        self.assertEqual(full_scans, [], f"Full table scan in:\n{plan}")
+        index_scans = [
+            line for line in plan.splitlines()
+            if re.search(r'\bSCAN \w+ USING (COVERING )?INDEX\b', line)
+        ]
+        self.assertEqual(len(index_scans), bounded_scans, f"Unbounded index scan in:\n{plan}")
+        if not allow_sort:
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, f"Sort without an index in:\n{plan}")
+        return plan
+
+    def test_section_items_in_position_order(self):
+        self.assertIndexed(SectionItem.objects.filter(section_id=1).order_by('position'))
+        self.assertIndexed(SectionItem.objects.filter(section__in=[1, 2]).order_by('section_id', 'position'))
+
+    def test_newest_in_genre(self):
+        # Each genre's membership list is read newest first straight off the
+        # (genre, created_at, card) index, stopping after the limit
+        self.assertIndexed(
+            GenreMembership.objects.filter(genre_id=1).select_related('card').order_by('-created_at', '-card_id')[:20]
+        )
+
+    def test_merged_genre_feeds(self):
+        # One LIMITed range scan per feed, never a pass over a whole genre
+        sql, params = genre_feeds_query([(1, 20, 0), (2, 10, 40), (1, 20, 20)])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        self.assertPlanIndexed(plan)
+        self.assertEqual(plan.count('INDEX movies_genr_genre_i'), 3, plan)
+
+    def test_title_pages(self):
+        for model in (Movie, Series):
+            self.assertIndexed(model.objects.order_by('title', 'id')[:51], bounded_scans=1)
+            self.assertIndexed(model.objects.filter(title__gt='M').order_by('title', 'id')[:51])
+
+    def test_active_landing_page(self):
+        # The partial index holds only the active row, sorting it is free
+        self.assertIndexed(
+            LandingPage.objects.filter(is_active=True).order_by('pk')[:1], allow_sort=True, bounded_scans=1
+        )
+
+    def test_landing_page_sections_in_position_order(self):
+        self.assertIndexed(
+            LandingPageSection.objects.filter(landing_page_id=1).select_related('section').order_by('position')
+        )
+
+    def test_section_rules(self):
+        # Each rule reads at most MAX_RULE_WALK ids off one index (a genre's
+        # membership list, or the LIMITed scan of the sort index), then
+        # sorts only those
+        rules = [
+            ({}, 1),
+            ({'genres': [1]}, 0),
+            ({'genres': [1, 2, 3], 'genre_match': 'all', 'sort': 'oldest'}, 0),
+            ({'genres': [1, 2], 'year': [2015, None], 'duration': [None, 120]}, 1),
+            ({'types': ['series'], 'sort': 'title', 'offset': 40}, 1),
+            ({'genres': [4], 'year': [2000, 2010], 'sort': 'latest_release'}, 1),
+        ]
+        for rule, bounded_scans in rules:
+            with self.subTest(rule=rule):
+                plan = self.assertIndexed(
+                    rule_queryset(compile_rule(rule)), allow_sort=True, bounded_scans=bounded_scans
+                )
+                self.assertIn('LIST SUBQUERY', plan)
+
+    def test_section_rule_limits(self):
+        for rule in [
+            {'sort': 'description'},
+            {'limit': 5000},
+            {'offset': 100000},
+            {'genres': list(range(1, 50))},
+            {'year': [2020, 2010]},
+            {'duration': [None, 90], 'types': ['series']},
+        ]:
+            with self.subTest(rule=rule), self.assertRaises(RuleError):
+                compile_rule(rule)
+
+
+class RuleTests(TestCase):
+    """Rules select within their walk, and rules that cannot fill a page are refused"""
+
+    def setUp(self):
+        self.drama, self.rare = Genre.objects.create(name='Drama'), Genre.objects.create(name='Rare')
+        for title in ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo']:
+            movie = Movie.objects.create(
+                title=title, description='', poster_url='https://example.com/p.jpg',
+                background_image_url='https://example.com/b.jpg',
+            )
+            movie.genres.add(self.rare if title == 'Echo' else self.drama)
+
+    @mock.patch('movies.rules.MAX_RULE_WALK', 3)
+    def test_walk_bounds_the_rule(self):
+        rule = compile_rule({'genres': [self.rare.id], 'sort': 'title', 'limit': 1})
+        self.assertEqual(select_cards(rule), [])
+        with self.assertRaises(RuleError):
+            check_rule_cost(rule)
+
+        # Newest first within a genre walks that genre's own list
+        rule = compile_rule({'genres': [self.rare.id], 'limit': 1})
+        self.assertEqual([card.title for card in select_cards(rule)], ['Echo'])
+        check_rule_cost(rule)
+
+    @mock.patch('movies.rules.MAX_RULE_WALK', 3)
+    def test_update_refuses_costly_rules(self):
+        section = Section.objects.create(name='Picks', section_type='carousel')
+        url = reverse('api-update-section', args=[section.id])
+        for rules, status in [
+            ({'genres': [self.rare.id], 'sort': 'title', 'limit': 1}, 400),
+            ({'genres': [self.drama.id], 'sort': 'title', 'limit': 2}, 200),
+        ]:
+            with self.subTest(rules=rules):
+                response = self.client.put(url, {
+                    'content_selection_type': 'automatic', 'settings': {'rules': rules},
+                }, content_type='application/json')
+                self.assertEqual(response.status_code, status)
+
+
+class SectionContentTests(TestCase):
+    """Manual sections resolve their content in bulk, skipping deleted content"""
+
+    def setUp(self):
+        self.movie, self.series = create_content(Movie, 'Night Train'), create_content(Series, 'Nightfall')
+        self.section = Section.objects.create(name='Picks', section_type='carousel')
+        for position, (model, object_id) in enumerate([
+            (Movie, self.movie.id), (Series, self.series.id), (Movie, self.movie.id + 1000),
+        ]):
+            SectionItem.objects.create(
+                section=self.section, content_type=ContentType.objects.get_for_model(model),
+                object_id=object_id, position=position,
+            )
+
+    def test_bulk_add(self):
+        movies = [create_content(Movie, f'Title {number}') for number in range(20)]
+        items = (
+            [{'content_type': 'movie', 'content_id': movie.id} for movie in movies]
+            + [{'content_type': 'movie', 'content_id': self.movie.id}, {'content_type': 'series', 'content_id': 999}]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('api-bulk-add-content-to-section', args=[self.section.id]), {'items': items},
+                content_type='application/json',
+            ).json()
+        inserts = [query for query in queries if '"movies_sectionitem"' in query['sql'] and 'INSERT' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(response['added']), 20)
+        self.assertEqual([item['reason'] for item in response['skipped']], ['duplicate', 'not_found'])
+        self.assertEqual(
+            [card.title for card in self.section.get_content()][2:], [movie.title for movie in movies]
+        )
+
+    def test_resolve_section_items(self):
+        items = SectionItem.objects.filter(section=self.section).order_by('position')
+        # One query for the items, then one per content type
+        with self.assertNumQueries(3):
+            resolved = resolve_section_items(items)
+            contents = [item.content_object for item in resolved]
+        self.assertEqual(contents, [self.movie, self.series, None])
+
+    def test_get_content(self):
+        with self.assertNumQueries(1):
+            titles = [card.title for card in self.section.get_content()]
+        self.assertEqual(titles, ['Night Train', 'Nightfall'])
+
+
+class CardTests(TestCase):
+    """Content cards and genre memberships follow every write to their content"""
+
+    def card(self, content):
+        return ContentCard.objects.get(content_type=ContentType.objects.get_for_model(content), object_id=content.id)
+
+    def test_cards_follow_writes(self):
+        drama = Genre.objects.create(name='Drama')
+        series = create_content(Series, 'Nightfall', seasons=2)
+        self.assertEqual((self.card(series).kind, self.card(series).seasons), ('series', 2))
+
+        series.title = 'Nightfall Returns'
+        series.save()
+        series.genres.add(drama)
+        card = self.card(series)
+        self.assertEqual((card.title, card.genre_ids), ('Nightfall Returns', [drama.id]))
+        self.assertEqual(list(GenreMembership.objects.filter(genre=drama).values_list('card_id', flat=True)), [card.id])
+
+        series.genres.remove(drama)
+        self.assertFalse(GenreMembership.objects.exists())
+        series.delete()
+        self.assertFalse(ContentCard.objects.exists())
+
+
+class GenreFeedTests(TestCase):
+    """Page builds read the top of each genre's membership list"""
+
+    def test_merged_feeds_match_membership_lists(self):
+        drama, comedy = Genre.objects.create(name='Drama'), Genre.objects.create(name='Comedy')
+        for number in range(12):
+            model = Movie if number % 3 else Series
+            item = model.objects.create(
+                title=f'Title {number}', description='', poster_url='https://example.com/p.jpg',
+                background_image_url='https://example.com/b.jpg',
+            )
+            item.genres.add(drama if number % 2 else comedy, *([drama] if number % 5 == 0 else []))
+
+        feeds = [(drama.id, 4, 0), (drama.id, 4, 3), (comedy.id, 20, 0), (comedy.id, 0, 0), (comedy.id, 5, 50)]
+        resolved = resolve_feeds_merged(dict.fromkeys(feeds))
+        for feed in feeds:
+            with self.subTest(feed=feed):
+                self.assertEqual([card.id for card in resolved[feed]], [card.id for card in newest_in_genre(*feed)])
+
+    def test_automatic_section_window(self):
+        drama = Genre.objects.create(name='Drama')
+        for number in range(6):
+            create_content(Movie, f'Title {number}').genres.add(drama)
+        section = Section.objects.create(
+            name='Drama', section_type='carousel', content_selection_type='automatic', auto_genre=drama,
+            settings={'limit': 3, 'offset': 2},
+        )
+        self.assertEqual([card.title for card in section.get_content()], ['Title 3', 'Title 2', 'Title 1'])
+
+    def test_feed_window_is_capped(self):
+        section = Section(content_selection_type='automatic', settings={'limit': 10 ** 6, 'offset': 10 ** 9})
+        self.assertEqual(section.get_feed_window(), (Section.MAX_AUTO_CONTENT_LIMIT, Section.MAX_AUTO_CONTENT_OFFSET))
+
+
+class CatalogueTests(TestCase):
+    """The catalogue endpoints page by keyset and load only the requested fields"""
+
+    def setUp(self):
+        for title in ['Bravo', 'Alpha', 'Delta', 'Charlie', 'Echo']:
+            create_content(Movie, title)
+
+    def test_keyset_pages(self):
+        url = reverse('api-movies')
+        titles, cursor = [], None
+        while True:
+            response = self.client.get(url, {'limit': 2, **({'cursor': cursor} if cursor else {})}).json()
+            self.assertLessEqual(len(response['results']), 2)
+            titles += [row['title'] for row in response['results']]
+            cursor = response['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(titles, ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo'])
+
+    def test_fields(self):
+        response = self.client.get(reverse('api-movies'), {'limit': 1, 'fields': 'id,title'}).json()
+        self.assertEqual(list(response['results'][0]), ['id', 'title'])
+
+    def test_conditional_get(self):
+        url = reverse('api-movies')
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with mock.patch('movies.views.catalogue_response') as catalogue_response:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            catalogue_response.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_content(Movie, 'Foxtrot')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_streaming_exports(self):
+        url = reverse('api-movies')
+        titles = ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo']
+        with mock.patch('movies.streaming.STREAM_BUFFER_SIZE', 1):
+            response = self.client.get(url, {'stream': '1', 'fields': 'title'})
+            self.assertTrue(response.streaming)
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), [{'title': title} for title in titles])
+
+            response = self.client.get(url, {'format': 'ndjson', 'fields': 'title'})
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = b''.join(response.streaming_content).splitlines()
+            self.assertEqual([json.loads(line) for line in lines], [{'title': title} for title in titles])
+
+    def test_invalid_parameters(self):
+        created_cursor = self.client.get(reverse('api-movies'), {'limit': 1, 'ordering': 'created'}).json()['next_cursor']
+        for params in [
+            {'fields': 'id,budget'},
+            {'cursor': 'not-a-cursor'},
+            {'cursor': created_cursor},
+            {'limit': 'many'},
+            {'limit': 1, 'ordering': 'rating'},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('api-movies'), params).status_code, 400)
+
+
+class LandingPageListTests(TestCase):
+    """The landing page list costs the same queries however many pages there are"""
+
+    def setUp(self):
+        sections = [Section.objects.create(name=f'Section {number}', section_type='carousel') for number in range(2)]
+        for number in range(5):
+            landing_page = LandingPage.objects.create(name=f'Page {number}', is_active=number == 0)
+            for position, section in enumerate(sections):
+                LandingPageSection.objects.create(landing_page=landing_page, section=section, position=position)
+
+    def test_listing(self):
+        with CaptureQueriesContext(connection) as queries:
+            pages = self.client.get(reverse('api-landing-pages')).json()
+        self.assertEqual(len(pages), 5)
+        self.assertEqual(pages[0]['name'], 'Page 0')
+        self.assertEqual([len(page['landingpagesection_set']) for page in pages], [2] * 5)
+        # The page list, then one prefetch of every page's sections
+        content_queries = [query for query in queries if 'movies_landingpage' in query['sql']]
+        self.assertEqual(len(content_queries), 2)
+
+    def test_summary_pages(self):
+        url = reverse('api-landing-pages')
+        response = self.client.get(url, {'summary': '1', 'limit': 3}).json()
+        self.assertEqual(response['results'][0], {
+            'id': response['results'][0]['id'], 'name': 'Page 0', 'is_active': True, 'section_count': 2,
+        })
+        self.assertEqual(response['next_offset'], 3)
+        response = self.client.get(url, {'summary': '1', 'limit': 3, 'offset': 3}).json()
+        self.assertEqual((len(response['results']), response['next_offset']), (2, None))
+        self.assertEqual(self.client.get(url, {'offset': 'last'}).status_code, 400)
+
+
+class AsyncViewTests(TestCase):
+    """The async views answer exactly like their sync versions"""
+
+    def setUp(self):
+        cache.clear()
+        active_page._local = None
+        drama = Genre.objects.create(name='Drama')
+        manual = Section.objects.create(name='Picks', section_type='carousel')
+        automatic = Section.objects.create(
+            name='Drama', section_type='grid', content_selection_type='automatic', auto_genre=drama,
+        )
+        for number, model in enumerate([Movie, Series, Movie]):
+            content = create_content(model, f'Title {number}')
+            content.genres.add(drama)
+            SectionItem.objects.create(
+                section=manual, content_type=ContentType.objects.get_for_model(model), object_id=content.id,
+                position=number,
+            )
+        landing_page = LandingPage.objects.create(name='Home', is_active=True)
+        for position, section in enumerate([manual, automatic]):
+            LandingPageSection.objects.create(landing_page=landing_page, section=section, position=position)
+        self.section = manual
+
+    def test_responses_match(self):
+        for name, args, params in [
+            ('page-data', [], {}),
+            ('api-sections', [], {}),
+            ('api-section-content', [self.section.id], {}),
+            ('api-movies', [], {}),
+            ('api-movies', [], {'limit': 1, 'fields': 'id,title,genres'}),
+            ('api-series', [], {'cursor': 'not-a-cursor'}),
+        ]:
+            with self.subTest(name=name, params=params):
+                response = self.client.get(reverse(name, args=args), params)
+                async_response = self.client.get(reverse(f'async-{name}', args=args), params)
+                self.assertEqual(async_response.status_code, response.status_code)
+                self.assertEqual(async_response.json(), response.json())
+
+
+class SchedulerTests(TransactionTestCase):
+    """Both resolution modes give every section the content it would read alone"""
+
+    def setUp(self):
+        drama, comedy = Genre.objects.create(name='Drama'), Genre.objects.create(name='Comedy')
+        for number in range(8):
+            content = create_content(Movie if number % 2 else Series, f'Title {number}', release_year=2010 + number)
+            content.genres.add(drama if number % 3 else comedy)
+        manual = Section.objects.create(name='Picks', section_type='carousel')
+        SectionItem.objects.create(
+            section=manual, content_type=ContentType.objects.get_for_model(Movie),
+            object_id=Movie.objects.order_by('id').first().id,
+        )
+        for name, genre, settings in [
+            ('Drama', drama, {'limit': 3}),
+            ('Drama again', drama, {'limit': 3}),
+            ('More drama', drama, {'limit': 3, 'offset': 3}),
+            ('Comedy', comedy, {}),
+            ('Recent', None, {'rules': {'year': [2014, None], 'sort': 'latest_release'}}),
+        ]:
+            Section.objects.create(
+                name=name, section_type='carousel', content_selection_type='automatic', auto_genre=genre,
+                settings=settings,
+            )
+
+    def contents(self, sections):
+        return {section.name: [card.id for card in section.get_content()] for section in sections}
+
+    def test_modes_agree(self):
+        expected = self.contents(Section.objects.all())
+        self.assertTrue(all(expected.values()))
+        for mode, queries in [('merged', 3), ('threads', None)]:
+            with self.subTest(mode=mode):
+                sections = list(Section.objects.all())
+                with CaptureQueriesContext(connection) as captured:
+                    resolve_sections(sections, mode)
+                if queries is not None:
+                    # Manual sections, every genre feed, and the one rule
+                    self.assertEqual(len(captured), queries)
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.contents(sections), expected)
+
+        with self.assertRaises(ValueError):
+            resolve_sections([], 'serial')
+
+
+class InvalidationTests(TransactionTestCase):
+    """Writes evict the pages they feed, and only once the data they render is current"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_writes_evict_only_what_they_feed(self):
+        drama = Genre.objects.create(name='Drama')
+        movie, other = create_content(Movie, 'Night Train'), create_content(Movie, 'Morning Glory')
+        manual = Section.objects.create(name='Picks', section_type='carousel')
+        SectionItem.objects.create(section=manual, content_type=ContentType.objects.get_for_model(Movie), object_id=movie.id)
+        automatic = Section.objects.create(
+            name='Drama', section_type='carousel', content_selection_type='automatic', auto_genre=drama,
+        )
+        home, archive = LandingPage.objects.create(name='Home'), LandingPage.objects.create(name='Archive')
+        LandingPageSection.objects.create(landing_page=home, section=manual)
+        LandingPageSection.objects.create(landing_page=archive, section=automatic)
+
+        def versions():
+            section_versions = fragments.get_versions([manual.id, automatic.id])
+            return {
+                **{('section', section_id): version for section_id, version in section_versions.items()},
+                **{('page', page.id): snapshot.get_version(page.id) for page in (home, archive)},
+            }
+
+        def changed(before, after):
+            return {key for key in before if before[key] != after[key]}
+
+        before = versions()
+        movie.title = 'Day Train'
+        movie.save()
+        self.assertEqual(changed(before, versions()), {('section', manual.id), ('page', home.id)})
+
+        before = versions()
+        other.genres.add(drama)
+        self.assertEqual(changed(before, versions()), {('section', automatic.id), ('page', archive.id)})
+
+    def test_read_during_card_sync_is_not_served_after_the_save(self):
+        movie = Movie.objects.create(
+            title='Old Title', description='', poster_url='https://example.com/p.jpg',
+            background_image_url='https://example.com/b.jpg',
+        )
+        section = Section.objects.create(name='Picks', section_type='carousel')
+        SectionItem.objects.create(section=section, content_type=ContentType.objects.get_for_model(Movie), object_id=movie.id)
+        landing_page = LandingPage.objects.create(name='Home', is_active=True)
+        LandingPageSection.objects.create(landing_page=landing_page, section=section)
+        url = reverse('page-data')
+        self.assertContains(self.client.get(url), 'Old Title')
+
+        sync_card = cards.sync_card
+
+        def sync_card_with_concurrent_read(content):
+            # A page request landing in the middle of the save
+            self.client.get(url)
+            return sync_card(content)
+
+        with mock.patch('movies.cards.sync_card', sync_card_with_concurrent_read):
+            movie.title = 'New Title'
+            movie.save()
+        self.assertContains(self.client.get(url), 'New Title')
+
+    def test_new_content_reaches_genreless_rule_sections(self):
+        section = Section.objects.create(
+            name='Latest', section_type='carousel', content_selection_type='automatic',
+            settings={'rules': {'types': ['movie']}},
+        )
+        landing_page = LandingPage.objects.create(name='Home', is_active=True)
+        LandingPageSection.objects.create(landing_page=landing_page, section=section)
+        url = reverse('page-data')
+        self.assertNotContains(self.client.get(url), 'Brand New')
+
+        Movie.objects.create(
+            title='Brand New', description='', poster_url='https://example.com/p.jpg',
+            background_image_url='https://example.com/b.jpg',
+        )
+        self.assertContains(self.client.get(url), 'Brand New')
+
+    def test_last_modified_moves_forward_when_an_older_page_goes_live(self):
+        prewarmed = LandingPage.objects.create(name='Prewarmed')
+        with mock.patch('time.time', return_value=1000000000):
+            rebuild_snapshot(prewarmed.id)
+        with mock.patch('time.time', return_value=1000001000):
+            LandingPage.objects.create(name='Home', is_active=True)
+            response = self.client.get(reverse('page-data'))
+        self.assertEqual(response.status_code, 200)
+
+        with mock.patch('time.time', return_value=1000002000):
+            prewarmed.activate()
+        response = self.client.get(reverse('page-data'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+
+
+class PageDataTests(TransactionTestCase):
+    """page_data serves a precompiled page and rebuilds only what writes change"""
+
+    def setUp(self):
+        cache.clear()
+        active_page._local = None
+        self.movie = create_content(Movie, 'Night Train')
+        self.section = Section.objects.create(name='Picks', section_type='carousel')
+        SectionItem.objects.create(
+            section=self.section, content_type=ContentType.objects.get_for_model(Movie), object_id=self.movie.id
+        )
+        self.landing_page = LandingPage.objects.create(name='Home', is_active=True)
+        LandingPageSection.objects.create(landing_page=self.landing_page, section=self.section)
+
+    def test_snapshot_is_rebuilt_after_writes_only(self):
+        url = reverse('page-data')
+        with mock.patch('movies.snapshot.build_page', wraps=snapshot.build_page) as build_page:
+            first = self.client.get(url)
+            warm = self.client.get(url)
+            self.assertEqual(build_page.call_count, 1)
+            self.assertEqual((warm.content, warm['X-Page-Version']), (first.content, first['X-Page-Version']))
+
+            self.movie.title = 'Day Train'
+            self.movie.save()
+            response = self.client.get(url)
+            self.assertEqual(build_page.call_count, 2)
+        self.assertNotEqual(response['X-Page-Version'], first['X-Page-Version'])
+        self.assertContains(response, 'Day Train')
+
+
+    def test_only_changed_sections_are_rendered(self):
+        other = Section.objects.create(name='More', section_type='grid')
+        SectionItem.objects.create(
+            section=other, content_type=ContentType.objects.get_for_model(Series),
+            object_id=create_content(Series, 'Nightfall').id,
+        )
+        LandingPageSection.objects.create(landing_page=self.landing_page, section=other, position=1)
+        # A second page sharing the section reuses its fragment
+        archive = LandingPage.objects.create(name='Archive')
+        LandingPageSection.objects.create(landing_page=archive, section=other)
+
+        with mock.patch('movies.fragments.encode_section', wraps=fragments.encode_section) as encode_section:
+            self.client.get(reverse('page-data'))
+            rebuild_snapshot(archive.id)
+            self.assertEqual(sorted(call.args[0].id for call in encode_section.call_args_list), [self.section.id, other.id])
+
+            encode_section.reset_mock()
+            self.movie.title = 'Day Train'
+            self.movie.save()
+            response = self.client.get(reverse('page-data'))
+            self.assertEqual([call.args[0].id for call in encode_section.call_args_list], [self.section.id])
+        self.assertContains(response, 'Day Train')
+        self.assertContains(response, 'Nightfall')
+
+
+@mock.patch('movies.views.SYNC_COMMIT_LAG', timedelta(0))
+class SyncTests(TestCase):
+    """Incremental sync reports every change to what it serializes"""
+
+    def test_genre_changes_are_upserts(self):
+        movie = Movie.objects.create(
+            title='Night Train', description='', poster_url='https://example.com/p.jpg',
+            background_image_url='https://example.com/b.jpg',
+        )
+        drama = Genre.objects.create(name='Drama')
+        url = reverse('api-sync', args=['movies'])
+        cursor = self.client.get(url).json()['next_cursor']
+
+        movie.genres.add(drama)
+        response = self.client.get(url, {'cursor': cursor}).json()
+        self.assertEqual([row['id'] for row in response['upserts']], [movie.id])
+        cursor = response['next_cursor']
+
+        drama.movies.clear()
+        self.assertEqual([row['id'] for row in self.client.get(url, {'cursor': cursor}).json()['upserts']], [movie.id])
+
+    def test_tombstones_are_paginated(self):
+        url = reverse('api-sync', args=['movies'])
+        cursors = self.client.get(url).json()
+        Tombstone.record(Movie, range(1, 6))
+
+        tombstones = []
+        for _ in range(3):
+            response = self.client.get(url, {
+                'cursor': cursors['next_cursor'], 'tombstone_cursor': cursors['next_tombstone_cursor'], 'limit': 2,
+            }).json()
+            self.assertLessEqual(len(response['tombstones']), 2)
+            tombstones += response['tombstones']
+            cursors = response
+        self.assertFalse(response['has_more'])
+        self.assertEqual(tombstones, [1, 2, 3, 4, 5])
+
+    def test_recent_writes_wait_for_the_commit_lag(self):
+        url = reverse('api-sync', args=['movies'])
+        with mock.patch('movies.views.SYNC_COMMIT_LAG', timedelta(hours=1)):
+            cursor = self.client.get(url).json()['next_cursor']
+            movie = Movie.objects.create(
+                title='Night Train', description='', poster_url='https://example.com/p.jpg',
+                background_image_url='https://example.com/b.jpg',
+            )
+            Tombstone.record(Movie, [movie.id + 1])
+            response = self.client.get(url, {'cursor': cursor}).json()
+        self.assertEqual((response['upserts'], response['tombstones']), ([], []))
+
+        response = self.client.get(url, {'cursor': cursor}).json()
+        self.assertEqual(
+            ([row['id'] for row in response['upserts']], response['tombstones']), ([movie.id], [movie.id + 1])
+        )
+
+    def test_section_delete_records_item_tombstones_in_bulk(self):
+        section = Section.objects.create(name='Picks', section_type='carousel')
+        content_type = ContentType.objects.get_for_model(Movie)
+        items = SectionItem.objects.bulk_create(
+            SectionItem(section=section, content_type=content_type, object_id=object_id, position=object_id)
+            for object_id in range(1, 51)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            section.delete()
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "movies_tombstone"')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(
+            set(Tombstone.objects.filter(content_type=ContentType.objects.get_for_model(SectionItem)).values_list('object_id', flat=True)),
+            {item.id for item in items},
+        )
+
+
+class OrderingTests(TestCase):
+    """Reorders never leave two rows of a list at the same position"""
+
+    def test_subset_reorder_keeps_the_other_rows_in_place(self):
+        section = Section.objects.create(name='Picks', section_type='carousel')
+        content_type = ContentType.objects.get_for_model(Movie)
+        first, second, third, fourth = SectionItem.objects.bulk_create(
+            # The last two share a position, as rows written before gap spacing can
+            SectionItem(section=section, content_type=content_type, object_id=object_id, position=position)
+            for object_id, position in [(1, 0), (2, 1024), (3, 2048), (4, 2048)]
+        )
+        items = SectionItem.objects.filter(section=section)
+
+        apply_order(items, [third.id, first.id])
+        self.assertEqual(list(items.order_by('position').values_list('id', flat=True)), [third.id, second.id, first.id, fourth.id])
+        self.assertEqual(len(set(items.values_list('position', flat=True))), 4)
+
+        with self.assertRaises(OrderingError):
+            apply_order(items, [first.id, 999])
+
+    def test_reorder_endpoint(self):
+        landing_page = LandingPage.objects.create(name='Home')
+        first, second, third = [
+            LandingPageSection.objects.create(
+                landing_page=landing_page, section=Section.objects.create(name=name, section_type='carousel'),
+                position=position,
+            )
+            for position, name in enumerate(['First', 'Second', 'Third'])
+        ]
+        rows = LandingPageSection.objects.filter(landing_page=landing_page)
+        url = reverse('api-reorder-landing-page-sections', args=[landing_page.id])
+
+        response = self.client.post(url, {'section_order': [third.id, first.id, second.id]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(rows.order_by('position')), [third, first, second])
+
+        # A bad order changes nothing
+        response = self.client.post(url, {'section_order': [first.id, 999]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(rows.order_by('position')), [third, first, second])
+
+    def test_move_after(self):
+        section = Section.objects.create(name='Picks', section_type='carousel')
+        content_type = ContentType.objects.get_for_model(Movie)
+        first, second, third = SectionItem.objects.bulk_create(
+            # No room between the first two, so moving there rebalances
+            SectionItem(section=section, content_type=content_type, object_id=object_id, position=position)
+            for object_id, position in [(1, 0), (2, 1), (3, 2)]
+        )
+        items = SectionItem.objects.filter(section=section)
+        url = reverse('api-move-section-content', args=[section.id, third.id])
+
+        for after_id, order in [(first.id, [first, third, second]), (None, [third, first, second])]:
+            with self.subTest(after_id=after_id):
+                response = self.client.post(url, {'after_id': after_id}, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(items.order_by('position')), order)
+                self.assertEqual(len(set(items.values_list('position', flat=True))), 3)
+
+        for after_id in ['abc', [first.id], 999]:
+            with self.subTest(after_id=after_id):
+                response = self.client.post(url, {'after_id': after_id}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+class CleanupTests(TestCase):
+    """Orphaned section items are deleted in batches with their tombstones"""
+
+    def test_cleanup_orphaned_content(self):
+        movie = Movie.objects.create(
+            title='Night Train', description='', poster_url='https://example.com/p.jpg',
+            background_image_url='https://example.com/b.jpg',
+        )
+        section = Section.objects.create(name='Picks', section_type='carousel')
+        content_type = ContentType.objects.get_for_model(Movie)
+        kept, *orphans = SectionItem.objects.bulk_create(
+            SectionItem(section=section, content_type=content_type, object_id=object_id, position=position)
+            for position, object_id in enumerate([movie.id, *range(movie.id + 1, movie.id + 6)])
+        )
+
+        call_command('cleanup_orphaned_content', dry_run=True, stdout=StringIO())
+        self.assertEqual(SectionItem.objects.count(), 6)
+
+        call_command('cleanup_orphaned_content', batch_size=2, stdout=StringIO())
+        self.assertEqual(list(SectionItem.objects.all()), [kept])
+        self.assertEqual(
+            sorted(Tombstone.objects.filter(
+                content_type=ContentType.objects.get_for_model(SectionItem)
+            ).values_list('object_id', flat=True)),
+            [item.id for item in orphans],
+        )
+
+
+class ActivePageTests(TestCase):
+    """The active page pointer follows activations, across processes too"""
+
+    def setUp(self):
+        cache.clear()
+        active_page._local = None
+
+    def test_pointer_follows_activation(self):
+        home = LandingPage.objects.create(name='Home', is_active=True)
+        other = LandingPage.objects.create(name='Other')
+        self.assertEqual(active_page.get_active_id(), home.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.activate()
+        self.assertEqual(active_page.get_active_id(), other.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(active_page.get_active_id(), other.id)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_reads_the_database(self):
+        home = LandingPage.objects.create(name='Home', is_active=True)
+        other = LandingPage.objects.create(name='Other')
+        self.assertEqual(active_page.get_active_id(), home.id)
+
+        # An activation made by another process: no signal reaches this one
+        LandingPage.objects.filter(id=home.id).update(is_active=False)
+        LandingPage.objects.filter(id=other.id).update(is_active=True)
+        active_page._local = None
+        self.assertEqual(active_page.get_active_id(), other.id)
+
+
+class ScheduledActivationTests(TransactionTestCase):
+    """Scheduled pages are pre-built ahead of time and activated once due"""
+
+    def setUp(self):
+        cache.clear()
+        active_page._local = None
+        self.home = LandingPage.objects.create(name='Home', is_active=True)
+        self.sale = LandingPage.objects.create(name='Sale')
+
+    def test_warm_then_activate(self):
+        now = timezone.now()
+        schedule = LandingPageSchedule.objects.create(landing_page=self.sale, activate_at=now + timedelta(minutes=2))
+        later = LandingPageSchedule.objects.create(landing_page=self.home, activate_at=now + timedelta(hours=1))
+
+        with mock.patch('movies.snapshot.build_page', return_value=b'{}') as build_page:
+            call_command('activate_scheduled_pages', stdout=StringIO())
+            schedule.refresh_from_db()
+            self.assertIsNotNone(schedule.warmed_at)
+            self.assertEqual((schedule.status, build_page.call_count), ('pending', 1))
+
+            with mock.patch('django.utils.timezone.now', return_value=now + timedelta(minutes=3)):
+                call_command('activate_scheduled_pages', stdout=StringIO())
+            # Warm already, so the switch does not build the page again
+            self.assertEqual(build_page.call_count, 1)
+        schedule.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual((schedule.status, later.status), ('activated', 'pending'))
+        self.assertEqual(active_page.get_active_id(), self.sale.id)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_only_activates(self):
+        schedule = LandingPageSchedule.objects.create(landing_page=self.sale, activate_at=timezone.now())
+        stderr = StringIO()
+        with mock.patch('movies.snapshot.build_page') as build_page:
+            call_command('activate_scheduled_pages', stdout=StringIO(), stderr=stderr)
+        build_page.assert_not_called()
+        self.assertIn('process-local', stderr.getvalue())
+        schedule.refresh_from_db()
+        self.assertEqual((schedule.status, schedule.warmed_at), ('activated', None))
+        self.assertEqual(LandingPage.objects.get(is_active=True), self.sale)
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Concurrent misses on one page rebuild it once"""
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_concurrent_misses(self):
+        builds = []
+
+        def build_page(landing_page_id):
+            builds.append(landing_page_id)
+            time.sleep(0.2)
+            return b'{}'
+
+        with mock.patch('movies.snapshot.build_page', build_page):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                snapshots = list(pool.map(lambda _: get_snapshot(1), range(8)))
+
+        self.assertEqual(builds, [1])
+        self.assertEqual({page.body for page in snapshots}, {b'{}'})
+
+
+class SearchTests(TestCase):
+    """Both search backends find the same content and rank title hits first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.drama = Genre.objects.create(name='Drama')
+        content = {
+            'Night Train': (Movie, 'A journey across Europe', 2019),
+            'Nightfall': (Series, 'Detectives work the late shift', 2021),
+            'Harbour Lights': (Movie, 'A night in the docks', 2008),
+            'Morning Glory': (Movie, 'Breakfast television', 2010),
+        }
+        for title, (model, description, year) in content.items():
+            item = model.objects.create(
+                title=title, description=description, release_year=year,
+                poster_url='https://example.com/p.jpg', background_image_url='https://example.com/b.jpg',
+            )
+            if year > 2010:
+                item.genres.add(cls.drama)
+
+    def search(self, backend, **params):
+        return [card.title for card in backend.search(parse_search(params), 10)]
+
+    def test_backends(self):
+        backends = [BasicSearchBackend()]
+        if FTS5SearchBackend.is_available():
+            backends.append(FTS5SearchBackend())
+        for backend in backends:
+            with self.subTest(backend=type(backend).__name__):
+                results = self.search(backend, q='nigh')
+                self.assertEqual(sorted(results), ['Harbour Lights', 'Night Train', 'Nightfall'])
+                self.assertEqual(results[-1], 'Harbour Lights')
+                self.assertEqual(self.search(backend, q='night', type='series'), ['Nightfall'])
+                self.assertEqual(self.search(backend, q='night', year_to='2010'), ['Harbour Lights'])
+                self.assertEqual(self.search(backend, q='nigh', genre=str(self.drama.id), year='2019'), ['Night Train'])
+
+
+class TypeaheadTests(SimpleTestCase):
+    """The in-process index ranks prefix matches first and sees writes at once"""
+
+    def index(self, titles):
+        return TypeaheadIndex((normalize(title), ('movie', 'series').index(kind), object_id, title)
+                              for kind, object_id, title in titles)
+
+    def titles(self, index, query, **kwargs):
+        return [title for _, _, title in index.search(query, **kwargs)[0]]
+
+    def test_search_and_writes(self):
+        index = self.index([('movie', 1, 'The Dark Knight'), ('movie', 2, 'Darkest Hour'), ('series', 1, 'Dark')])
+
+        self.assertEqual(self.titles(index, 'dark'), ['Dark', 'Darkest Hour', 'The Dark Knight'])
+        self.assertEqual(index.search('ARK', kind='series'), ([('series', 1, 'Dark')], True))
+
+        index.put('movie', 3, 'Amélie')
+        index.put('movie', 2, 'Dunkirk')
+        index.remove('series', 1)
+        self.assertEqual(index.search('ame'), ([('movie', 3, 'Amélie')], True))
+        self.assertEqual(self.titles(index, 'dark'), ['The Dark Knight'])
+
+    @mock.patch('movies.typeahead.MAX_CANDIDATES', 2)
+    def test_candidate_cap_is_reported(self):
+        index = self.index([('movie', number, f'Film {number} Night') for number in range(5)])
+        matches, complete = index.search('night', limit=10)
+        self.assertEqual((len(matches), complete), (2, False))
+        # A full page is complete however many titles were left unchecked
+        self.assertEqual(index.search('film', limit=3)[1], True)
+        self.assertEqual(index.search('nothing', limit=10), ([], True))
+
+
+class TypeaheadWatermarkTests(TestCase):
+    """Writes made by any process move the database watermark"""
+
+    def test_database_watermark(self):
+        before = database_watermark()
+        older = create_content(Series, 'Nightfall')
+        create_content(Series, 'Daybreak')
+        saved = database_watermark()
+        self.assertNotEqual(saved, before)
+
+        # Leaves the newest updated_at as it was; its tombstone moves the watermark
+        older.delete()
+        self.assertNotEqual(database_watermark(), saved)
+        with self.assertNumQueries(3):
+            database_watermark()
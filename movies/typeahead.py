@@ -0,0 +1,351 @@
+"""
+In-process typeahead index over movie and series titles.
+
+The page builder filters titles on every keystroke, so /api/typeahead/
+answers from memory without touching the database. Titles are normalized
+(casefolded, accents and punctuation stripped) and matched two ways:
+
+    prefix    Entries are sorted by normalized title, so the titles that
+              start with the query are found with one bisect.
+    trigram   Every 3-character gram of a normalized title has a sorted
+              array('I') of the entries containing it. A query of three or
+              more characters walks the postings of its rarest gram, probes
+              the others with a bisect and checks the survivors for the
+              whole query.
+
+Prefix matches come first, then the other substring matches, each in title
+order. At most MAX_CANDIDATES titles are checked for substring matches;
+search() reports when that cut may have left matches out.
+
+Storage is array-backed: the normalized and display titles are each packed
+into one UTF-8 blob with array('I') offsets, and object ids and kinds sit
+in parallel arrays, so an entry costs no Python objects of its own. Per
+title that is
+
+    4 + 4    offsets of the two titles
+    4 + 1    object id and kind
+    n + t    UTF-8 bytes of the normalized (n) and display (t) titles
+    4 * g    one postings slot per distinct gram (g <= n - 2)
+
+about 5n + t + 5 bytes, ~130 bytes for a 20 character title. Normalized
+titles are cut to MAX_KEY_LENGTH characters, which bounds n and g however
+long a title is, and display titles are bounded by the 255 character model
+field. The postings dict grows with the number of distinct grams rather
+than with the number of titles, and levels off at a few tens of thousands.
+
+The index is built from ContentCard on first use, which takes a couple of
+seconds per 200k titles. Writes in this process reach it through the
+signals in movies/signals.py, as a small overlay that is folded into the
+arrays in the background once it holds MAX_PENDING titles. Writes made by
+other processes are picked up by a rebuild in the background once the
+index is REFRESH_INTERVAL seconds old and database_watermark() has moved.
+That watermark is read from the database itself (the newest updated_at of
+movies and series, and the newest of their tombstones), so it sees every
+process's writes whatever cache backend is configured.
+"""
+from array import array
+from bisect import bisect_left
+from itertools import islice
+import re
+import threading
+import time
+import unicodedata
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db.models import Max
+
+from .models import ContentCard, Movie, Series, Tombstone
+
+KINDS = ('movie', 'series')
+
+# Characters of a normalized title that are indexed
+MAX_KEY_LENGTH = 64
+GRAM_LENGTH = 3
+
+# Titles written in this process before the overlay is folded into the arrays
+MAX_PENDING = 256
+
+# Longest a process serves its index without checking for other processes' writes
+REFRESH_INTERVAL = 300
+
+# Most trigram candidates checked per query, so a query made of common grams
+# that rarely appear together still answers in bounded time
+MAX_CANDIDATES = 20000
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+SEPARATOR_RE = re.compile(r'[\W_]+')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize(title):
+    """Casefold, strip accents and punctuation, collapse spaces and cut to MAX_KEY_LENGTH"""
+    title = title.casefold()
+    if not title.isascii():
+        title = ''.join(
+            char for char in unicodedata.normalize('NFKD', title) if not unicodedata.combining(char)
+        )
+    return SEPARATOR_RE.sub(' ', title).strip()[:MAX_KEY_LENGTH]
+
+
+def grams(key):
+    """Distinct GRAM_LENGTH-character grams of a normalized title"""
+    return {key[i:i + GRAM_LENGTH] for i in range(len(key) - GRAM_LENGTH + 1)}
+
+
+def get_index():
+    """Get this process's index, building it on first use"""
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = TypeaheadIndex.from_database()
+            index = _index
+    elif index.is_due_for_refresh():
+        _refresh_in_background(index)
+    return index
+
+
+def database_watermark():
+    """Newest write to movies and series, read off their updated_at and tombstone indexes"""
+    return (
+        Movie.objects.aggregate(Max('updated_at'))['updated_at__max'],
+        Series.objects.aggregate(Max('updated_at'))['updated_at__max'],
+        Tombstone.objects.filter(
+            content_type__in=ContentType.objects.get_for_models(Movie, Series).values()
+        ).aggregate(Max('deleted_at'))['deleted_at__max'],
+    )
+
+
+def content_saved(kind, object_id, title):
+    """Add or update a title in the index, if this process has built one"""
+    if _index is not None:
+        _index.put(kind, object_id, title)
+
+
+def content_deleted(kind, object_id):
+    """Drop a title from the index, if this process has built one"""
+    if _index is not None:
+        _index.remove(kind, object_id)
+
+
+class TypeaheadIndex:
+    """Array-backed titles plus an overlay of the titles written since they were built"""
+
+    def __init__(self, entries, watermark=None):
+        # (titles, pending) are replaced together, so readers never need a
+        # lock; pending maps (kind code, object id) to (key, title), or to
+        # None for deleted content
+        self._state = (_Titles(entries), {})
+        self._write_lock = threading.Lock()
+        self._refreshing = False
+        self._folding = False
+        self.watermark = watermark
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def from_database(cls):
+        """Build the index from every content card"""
+        # Read before the cards, so a write during the build triggers a refresh
+        watermark = database_watermark()
+        rows = ContentCard.objects.values_list('kind', 'object_id', 'title').iterator(chunk_size=5000)
+        return cls(
+            ((normalize(title), KINDS.index(kind), object_id, title) for kind, object_id, title in rows),
+            watermark,
+        )
+
+    def search(self, query, limit=DEFAULT_LIMIT, kind=None):
+        """
+        Get (matches, complete) for a query.
+
+        matches are up to limit (kind, object_id, title), prefix matches
+        first. complete is False when fewer than limit were found and the
+        MAX_CANDIDATES cut may have left substring matches out.
+        """
+        key = normalize(query)
+        if not key or limit < 1:
+            return [], True
+        titles, pending = self._state
+        kind_code = None if kind is None else KINDS.index(kind)
+
+        results = []
+        for numbers, matches in (
+            (titles.prefix_matches(key), lambda candidate: candidate.startswith(key)),
+            (titles.substring_matches(key), lambda candidate: key in candidate and not candidate.startswith(key)),
+        ):
+            wanted = limit - len(results)
+            found = []
+            for number in numbers:
+                entry = (titles.kinds[number], titles.ids[number])
+                if entry in pending or (kind_code is not None and entry[0] != kind_code):
+                    continue
+                found.append((titles.key(number), entry, titles.title(number)))
+                if len(found) == wanted:
+                    break
+            # Titles written since the arrays were built
+            found.extend(
+                (value[0], entry, value[1]) for entry, value in pending.items()
+                if value is not None and (kind_code is None or entry[0] == kind_code) and matches(value[0])
+            )
+            found.sort()
+            results.extend(found[:wanted])
+            if len(results) >= limit:
+                break
+
+        complete = len(results) >= limit or not titles.candidates_capped(key)
+        return [(KINDS[code], object_id, title) for _, (code, object_id), title in results], complete
+
+    def put(self, kind, object_id, title):
+        self._write((KINDS.index(kind), object_id), (normalize(title), title))
+
+    def remove(self, kind, object_id):
+        self._write((KINDS.index(kind), object_id), None)
+
+    def is_due_for_refresh(self):
+        """Whether another process may have written titles this index has not seen"""
+        if self._refreshing or time.monotonic() - self.checked_at < REFRESH_INTERVAL:
+            return False
+        self.checked_at = time.monotonic()
+        return database_watermark() != self.watermark
+
+    def _write(self, entry, value):
+        with self._write_lock:
+            titles, pending = self._state
+            pending = {**pending, entry: value}
+            self._state = (titles, pending)
+            fold = len(pending) > MAX_PENDING and not self._folding
+            self._folding = self._folding or fold
+        if fold:
+            threading.Thread(target=self._fold, args=(titles, pending), name='typeahead-fold', daemon=True).start()
+
+    def _fold(self, titles, pending):
+        # Rebuilding the arrays takes a while, so it runs off the request
+        # path and queries keep using the overlay meanwhile
+        try:
+            folded = _Titles(titles.merged(pending))
+            with self._write_lock:
+                current = self._state[1]
+                # Keep only what was written during the fold
+                self._state = (folded, {
+                    entry: value for entry, value in current.items()
+                    if entry not in pending or pending[entry] is not value
+                })
+        finally:
+            self._folding = False
+
+
+class _Titles:
+    """Immutable titles sorted by normalized title, with their trigram postings"""
+
+    def __init__(self, entries):
+        # entries are (key, kind code, object id, title)
+        entries = sorted(entries)
+        self.keys, self.key_offsets = _pack(entry[0] for entry in entries)
+        self.titles, self.title_offsets = _pack(entry[3] for entry in entries)
+        self.kinds = array('B', (entry[1] for entry in entries))
+        self.ids = array('I', (entry[2] for entry in entries))
+
+        # Entries are numbered in title order, so every postings array is sorted
+        self.postings = {}
+        for number, entry in enumerate(entries):
+            for gram in grams(entry[0]):
+                postings = self.postings.get(gram)
+                if postings is None:
+                    postings = self.postings[gram] = array('I')
+                postings.append(number)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, number):
+        # Lets bisect search the normalized titles directly
+        return self.key(number)
+
+    def key(self, number):
+        return self.keys[self.key_offsets[number]:self.key_offsets[number + 1]].decode('utf-8')
+
+    def title(self, number):
+        return self.titles[self.title_offsets[number]:self.title_offsets[number + 1]].decode('utf-8')
+
+    def prefix_matches(self, key):
+        """Numbers of the entries starting with key, in title order"""
+        number = bisect_left(self, key)
+        while number < len(self) and self.key(number).startswith(key):
+            yield number
+            number += 1
+
+    def substring_matches(self, key):
+        """Numbers of the entries containing key but not starting with it, in title order"""
+        postings = self._postings(key)
+        if postings is None:
+            return
+        rarest, others = postings[0], postings[1:]
+
+        for number in islice(rarest, MAX_CANDIDATES):
+            if all(_contains(other, number) for other in others):
+                candidate = self.key(number)
+                if key in candidate and not candidate.startswith(key):
+                    yield number
+
+    def candidates_capped(self, key):
+        """Whether substring_matches() stops before checking every candidate for key"""
+        postings = self._postings(key)
+        return postings is not None and len(postings[0]) > MAX_CANDIDATES
+
+    def _postings(self, key):
+        """Postings of every gram of key, rarest first, or None if a gram has none"""
+        if len(key) < GRAM_LENGTH:
+            return None
+        postings = [self.postings.get(gram) for gram in grams(key)]
+        if None in postings:
+            return None
+        return sorted(postings, key=len)
+
+    def merged(self, pending):
+        """Entries of these titles with pending writes applied"""
+        for number in range(len(self)):
+            entry = (self.kinds[number], self.ids[number])
+            if entry not in pending:
+                yield self.key(number), entry[0], entry[1], self.title(number)
+        for (kind_code, object_id), value in pending.items():
+            if value is not None:
+                yield value[0], kind_code, object_id, value[1]
+
+
+def _pack(strings):
+    """Pack strings into one UTF-8 blob and the array('I') of their offsets"""
+    blob = bytearray()
+    offsets = array('I', [0])
+    for string in strings:
+        blob += string.encode('utf-8')
+        offsets.append(len(blob))
+    return bytes(blob), offsets
+
+
+def _contains(postings, number):
+    position = bisect_left(postings, number)
+    return position < len(postings) and postings[position] == number
+
+
+def _refresh_in_background(index):
+    index._refreshing = True
+
+    def rebuild():
+        global _index
+        try:
+            fresh = TypeaheadIndex.from_database()
+            with index._write_lock:
+                # Keep this process's writes made while the index was rebuilt
+                fresh._state = (fresh._state[0], index._state[1])
+                _index = fresh
+        finally:
+            index._refreshing = False
+            # Django connections are per thread; don't leave this one open
+            connections.close_all()
+
+    threading.Thread(target=rebuild, name='typeahead-refresh', daemon=True).start()
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # Core API endpoints needed for Page Builder
@@ -8,6 +8,18 @@ urlpatterns = [
     path('sections/', views.api_sections, name='api-sections'),
     path('movies/', views.api_movies, name='api-movies'),
     path('series/', views.api_series, name='api-series'),
+    path('search/', views.api_search, name='api-search'),
+    path('typeahead/', views.api_typeahead, name='api-typeahead'),
+    
+    # Async versions of the read endpoints, for ASGI deployments
+    path('async/page-data/', async_views.page_data, name='async-page-data'),
+    path('async/sections/', async_views.api_sections, name='async-api-sections'),
+    path('async/sections/<int:section_id>/content/', async_views.api_section_content, name='async-api-section-content'),
+    path('async/movies/', async_views.api_movies, name='async-api-movies'),
+    path('async/series/', async_views.api_series, name='async-api-series'),
+    
+    # Incremental sync (movies, series, sections, section-items)
+    path('sync/<slug:resource>/', views.api_sync, name='api-sync'),
     
     # Section Management
     path('sections/create/', views.api_create_section, name='api-create-section'),
@@ -16,14 +28,17 @@ urlpatterns = [
     # Section Content Management
     path('sections/<int:section_id>/content/', views.api_section_content, name='api-section-content'),
     path('sections/<int:section_id>/content/add/', views.api_add_content_to_section, name='api-add-content-to-section'),
+    path('sections/<int:section_id>/content/bulk-add/', views.api_bulk_add_content_to_section, name='api-bulk-add-content-to-section'),
     path('sections/<int:section_id>/content/<int:item_id>/remove/', views.api_remove_content_from_section, name='api-remove-content-from-section'),
     path('sections/<int:section_id>/content/reorder/', views.api_reorder_section_content, name='api-reorder-section-content'),
+    path('sections/<int:section_id>/content/<int:item_id>/move/', views.api_move_section_content, name='api-move-section-content'),
     
     # Landing Page Management
     path('landing-pages/<int:landing_page_id>/update/', views.api_update_landing_page, name='api-update-landing-page'),
     path('landing-pages/<int:landing_page_id>/sections/<int:section_id>/add/', views.api_add_section_to_landing_page, name='api-add-section-to-landing-page'),
     path('landing-pages/<int:landing_page_id>/sections/<int:section_id>/remove/', views.api_remove_section_from_landing_page, name='api-remove-section-from-landing-page'),
     path('landing-pages/<int:landing_page_id>/sections/reorder/', views.api_reorder_landing_page_sections, name='api-reorder-landing-page-sections'),
+    path('landing-pages/<int:landing_page_id>/sections/<int:section_id>/move/', views.api_move_landing_page_section, name='api-move-landing-page-section'),
     
     # Custom admin URLs
     path('custom-admin/', views.admin_dashboard, name='admin-dashboard'),
@@ -0,0 +1,73 @@
+"""
+Version counters kept in the cache.
+
+Section fragments, page snapshots and table watermarks are each validated
+by a version number stored in the cache and bumped on every write that
+changes what they were built from. A missing counter (cold or flushed
+cache) is seeded from the clock, so it never hands out a number that a
+copy cached before the flush was built against.
+
+Counters never expire in a shared cache. In a process-local one they expire
+after shared_cache.PROCESS_LOCAL_TIMEOUT, because writes made by other
+processes never bump them; the fresh counter then starts from the clock and
+forces a rebuild.
+"""
+import time
+
+from django.core.cache import cache
+
+from . import shared_cache
+
+
+def initial_version():
+    """Starting value for a counter that is not in the cache"""
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """Get the version stored under key, initialising it if needed"""
+    return get_versions([key])[key]
+
+
+def get_versions(keys):
+    """Get {key: version} for many keys with one cache read, initialising missing ones"""
+    cached = cache.get_many(keys)
+    versions = {}
+    for key in keys:
+        version = cached.get(key)
+        if version is None:
+            version = initial_version()
+            # Another process may have initialised it first; use its value
+            if not cache.add(key, version, shared_cache.timeout(None)):
+                version = cache.get(key, version)
+        versions[key] = version
+    return versions
+
+
+def bump_versions(keys):
+    """Bump the versions stored under keys"""
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # No version yet, so nothing can have been cached against it
+            pass
+
+
+async def aget_version(key):
+    """Async version of get_version()"""
+    return (await aget_versions([key]))[key]
+
+
+async def aget_versions(keys):
+    """Async version of get_versions()"""
+    cached = await cache.aget_many(keys)
+    versions = {}
+    for key in keys:
+        version = cached.get(key)
+        if version is None:
+            version = initial_version()
+            if not await cache.aadd(key, version, shared_cache.timeout(None)):
+                version = await cache.aget(key, version)
+        versions[key] = version
+    return versions
@@ -1,104 +1,237 @@
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count, Max
+from django.db.models import Count, Prefetch
 from django.views.decorators.http import require_POST
 from django.contrib.contenttypes.models import ContentType
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.db import transaction
 from .models import (
     Movie, Series, Genre, Section, SectionItem, 
-    LandingPage, LandingPageSection
+    LandingPage, LandingPageSection, Tombstone, resolve_section_items
 )
+from .ordering import POSITION_GAP, OrderingError, apply_order, move_after, next_position
+from .pagination import PaginationError, decode_cursor, encode_cursor, get_page_size, paginate
+from .rules import RuleError, check_rule_cost, compile_rule
+from .search import SearchError, parse_search, search
+from . import typeahead
+from .cards import attach_cards
+from .invalidation import invalidate_rows
+from .snapshot import get_snapshot as get_page_snapshot, last_modified as page_last_modified
+from .streaming import STREAM_CHUNK_SIZE, stream_request, wants_stream
+from .watermarks import conditional_response, conditional_table_response
+from datetime import timedelta
 import json
 
 # API Views for React Frontend
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_landing_pages(request):
-    """API endpoint for landing pages list"""
+    """
+    API endpoint for landing pages list
+    
+    Sections of every landing page are loaded with a single prefetch query.
+    ?summary=1 returns only id/name/is_active/section_count, ?limit= and
+    ?offset= paginate the list as {"results": [...], "next_offset": ...}.
+    """
     try:
-        landing_pages = LandingPage.objects.all().order_by('-is_active', '-updated_at')
-        data = []
-        for lp in landing_pages:
-            landing_page_sections = LandingPageSection.objects.filter(
-                landing_page=lp
-            ).select_related('section').order_by('position')
-            data.append({
-                'id': lp.id,
-                'name': lp.name,
-                'is_active': lp.is_active,
-                'created_at': lp.created_at.isoformat(),
-                'updated_at': lp.updated_at.isoformat(),
-                'landingpagesection_set': [
-                    {
-                        'id': lp_section.id,
-                        'position': lp_section.position,
-                        'section': {
-                            'id': lp_section.section.id,
-                            'name': lp_section.section.name,
-                            'section_type': lp_section.section.section_type,
-                            'content_selection_type': lp_section.section.content_selection_type,
-                        }
-                    }
-                    for lp_section in landing_page_sections
-                ]
-            })
-        return JsonResponse(data, safe=False)
+        return conditional_table_response(
+            request, ('landingpage', 'landingpagesection', 'section'),
+            lambda: landing_pages_response(request)
+        )
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+def landing_pages_response(request):
+    """Build the api_landing_pages response"""
+    landing_pages = LandingPage.objects.all().order_by('-is_active', '-updated_at', '-id')
+    
+    summary = request.GET.get('summary', '').lower() in ('1', 'true', 'yes')
+    if summary:
+        landing_pages = landing_pages.annotate(
+            section_count=Count('landingpagesection')
+        ).values('id', 'name', 'is_active', 'section_count')
+    else:
+        landing_pages = landing_pages.prefetch_related(landing_page_sections_prefetch())
+    
+    def serialize(lp):
+        if summary:
+            return lp
+        return serialize_landing_page(lp, lp.landingpagesection_set.all())
+    
+    if wants_stream(request):
+        rows = landing_pages.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        return stream_request(request, (serialize(lp) for lp in rows))
+    
+    if 'limit' not in request.GET and 'offset' not in request.GET:
+        return JsonResponse([serialize(lp) for lp in landing_pages], safe=False)
+    
+    try:
+        limit = get_page_size(request.GET.get('limit'))
+        offset = max(int(request.GET.get('offset') or 0), 0)
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'offset must be an integer'}, status=400)
+    
+    # Fetch one extra row to find out whether there is a next page
+    rows = list(landing_pages[offset:offset + limit + 1])
+    return JsonResponse({
+        'results': [serialize(lp) for lp in rows[:limit]],
+        'next_offset': offset + limit if len(rows) > limit else None,
+    })
+
+def landing_page_sections_prefetch():
+    """Prefetch for a landing page's sections in order, with the section loaded"""
+    return Prefetch(
+        'landingpagesection_set',
+        queryset=LandingPageSection.objects.select_related('section').order_by('position')
+    )
+
+def serialize_landing_page(lp, landing_page_sections):
+    """Serialize a landing page with its ordered sections"""
+    return {
+        'id': lp.id,
+        'name': lp.name,
+        'is_active': lp.is_active,
+        'created_at': lp.created_at.isoformat(),
+        'updated_at': lp.updated_at.isoformat(),
+        'landingpagesection_set': [
+            {
+                'id': lp_section.id,
+                'position': lp_section.position,
+                'section': {
+                    'id': lp_section.section.id,
+                    'name': lp_section.section.name,
+                    'section_type': lp_section.section.section_type,
+                    'content_selection_type': lp_section.section.content_selection_type,
+                }
+            }
+            for lp_section in landing_page_sections
+        ]
+    }
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_sections(request):
     """API endpoint for sections list"""
     try:
-        sections = Section.objects.annotate(
-            content_count=Count('sectionitem')
-        ).order_by('position')
-        
-        data = [
-            {
-                'id': section.id,
-                'name': section.name,
-                'section_type': section.section_type,
-                'content_selection_type': section.content_selection_type,
-                'position': section.position,
-                'content_count': section.content_count,
-            }
-            for section in sections
-        ]
+        def build_response():
+            sections = Section.objects.annotate(
+                content_count=Count('sectionitem')
+            ).order_by('position')
+            
+            data = [
+                {
+                    'id': section.id,
+                    'name': section.name,
+                    'section_type': section.section_type,
+                    'content_selection_type': section.content_selection_type,
+                    'position': section.position,
+                    'content_count': section.content_count,
+                }
+                for section in sections
+            ]
+            
+            return JsonResponse(data, safe=False)
         
-        return JsonResponse(data, safe=False)
+        return conditional_table_response(request, ('section', 'sectionitem'), build_response)
     
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+# Fields exposed by the catalogue endpoints; 'genres' comes from a prefetch
+MOVIE_FIELDS = (
+    'id', 'title', 'description', 'poster_url', 'background_image_url', 'link',
+    'duration_minutes', 'release_year', 'created_at', 'genres',
+)
+SERIES_FIELDS = (
+    'id', 'title', 'description', 'poster_url', 'background_image_url', 'link',
+    'seasons', 'episodes_count', 'release_year', 'created_at', 'genres',
+)
+
+def get_requested_fields(request, allowed_fields):
+    """Parse the ?fields= projection, defaulting to every allowed field"""
+    fields_param = request.GET.get('fields')
+    if not fields_param:
+        return allowed_fields
+    
+    fields = tuple(field.strip() for field in fields_param.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed_fields]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def project_queryset(queryset, fields):
+    """Load only the columns needed for the requested fields"""
+    queryset = queryset.only(*[field for field in fields if field != 'genres'])
+    if 'genres' in fields:
+        queryset = queryset.prefetch_related(
+            Prefetch('genres', queryset=Genre.objects.only('name'))
+        )
+    return queryset
+
+def serialize_content(content, fields):
+    """Serialize a movie or series restricted to the requested fields"""
+    data = {}
+    for field in fields:
+        if field == 'genres':
+            data['genres'] = [genre.name for genre in content.genres.all()]
+        elif field in ('created_at', 'updated_at'):
+            data[field] = getattr(content, field).isoformat()
+        else:
+            data[field] = getattr(content, field)
+    return data
+
+def catalogue_response(request, queryset, allowed_fields):
+    """
+    Build the response for a catalogue list endpoint.
+    
+    Without ?limit= or ?cursor= the whole list is returned as before. With
+    either of them the list is keyset-paginated (?ordering=title|created) and
+    the response is {"results": [...], "next_cursor": ...}. With ?stream=1
+    (or ?format=ndjson) the whole list is streamed from a database iterator.
+    """
+    try:
+        fields = get_requested_fields(request, allowed_fields)
+        queryset = project_queryset(queryset, fields)
+        
+        if wants_stream(request):
+            rows = queryset.order_by('title', 'id').iterator(chunk_size=STREAM_CHUNK_SIZE)
+            return stream_request(request, (serialize_content(row, fields) for row in rows))
+        
+        if 'limit' not in request.GET and 'cursor' not in request.GET:
+            rows = queryset.order_by('title')
+            return JsonResponse([serialize_content(row, fields) for row in rows], safe=False)
+        
+        rows, next_cursor = paginate(
+            queryset,
+            ordering=request.GET.get('ordering', 'title'),
+            cursor=request.GET.get('cursor'),
+            page_size=get_page_size(request.GET.get('limit')),
+        )
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'results': [serialize_content(row, fields) for row in rows],
+        'next_cursor': next_cursor,
+    })
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_movies(request):
     """API endpoint for movies list"""
     try:
-        movies = Movie.objects.all().order_by('title')
-        
-        data = [
-            {
-                'id': movie.id,
-                'title': movie.title,
-                'description': movie.description,
-                'poster_url': movie.poster_url,
-                'background_image_url': movie.background_image_url,
-                'link': movie.link,
-                'duration_minutes': movie.duration_minutes,
-                'release_year': movie.release_year,
-                'created_at': movie.created_at.isoformat(),
-                'genres': [genre.name for genre in movie.genres.all()],
-            }
-            for movie in movies
-        ]
-        
-        return JsonResponse(data, safe=False)
+        return conditional_table_response(
+            request, ('movie', 'genre'),
+            lambda: catalogue_response(request, Movie.objects.all(), MOVIE_FIELDS)
+        )
     
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -108,27 +241,186 @@ def api_movies(request):
 def api_series(request):
     """API endpoint for series list"""
     try:
-        series_list = Series.objects.all().order_by('title')
+        return conditional_table_response(
+            request, ('series', 'genre'),
+            lambda: catalogue_response(request, Series.objects.all(), SERIES_FIELDS)
+        )
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+def serialize_search_result(card):
+    """Serialize a content card found by search, in the shape the content pickers add"""
+    return {
+        'content_type': card.kind,
+        'content_id': card.object_id,
+        'title': card.title,
+        'description': card.description,
+        'poster_url': card.poster_url,
+        'release_year': card.release_year,
+    }
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_search(request):
+    """
+    API endpoint for searching movies and series by title and description.
+    
+    ?q= is matched word by word, the last word as a prefix. Optional filters
+    are ?genre=, ?type=movie|series and ?year= (or ?year_from= / ?year_to=).
+    Results are ranked and paginated with ?limit= and ?offset=.
+    """
+    try:
+        cards, next_offset = search(parse_search(request.GET))
+    except SearchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({
+        'results': [serialize_search_result(card) for card in cards],
+        'next_offset': next_offset,
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_typeahead(request):
+    """
+    API endpoint for as-you-type title suggestions.
+    
+    Answered from the in-process typeahead index (movies/typeahead.py)
+    without touching the database. ?q= matches title prefixes first, then
+    any part of a title; ?type=movie|series and ?limit= are optional.
+    "complete" is false when the index's candidate cap may have left
+    matches out, so the picker can fall back to /api/search/.
+    """
+    kind = request.GET.get('type') or None
+    if kind is not None and kind not in typeahead.KINDS:
+        return JsonResponse({'error': f"type must be one of: {', '.join(typeahead.KINDS)}"}, status=400)
+    try:
+        limit = int(request.GET.get('limit') or typeahead.DEFAULT_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+    limit = min(max(limit, 1), typeahead.MAX_LIMIT)
+    
+    try:
+        matches, complete = typeahead.get_index().search(request.GET.get('q', ''), limit, kind)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({
+        'results': [
+            {'content_type': content_type, 'content_id': content_id, 'title': title}
+            for content_type, content_id, title in matches
+        ],
+        'complete': complete,
+    })
+
+def serialize_section_for_sync(section):
+    """Serialize a section for the sync endpoint"""
+    return {
+        'id': section.id,
+        'name': section.name,
+        'section_type': section.section_type,
+        'content_selection_type': section.content_selection_type,
+        'position': section.position,
+        'auto_genre_id': section.auto_genre_id,
+        'settings': section.settings,
+        'updated_at': section.updated_at.isoformat(),
+    }
+
+def serialize_section_item_for_sync(item):
+    """Serialize a section item for the sync endpoint"""
+    return {
+        'id': item.id,
+        'section_id': item.section_id,
+        'position': item.position,
+        'content_type': ContentType.objects.get_for_id(item.content_type_id).model,
+        'content_id': item.object_id,
+        'updated_at': item.updated_at.isoformat(),
+    }
+
+# How long a write may take to commit before incremental sync reports it
+SYNC_COMMIT_LAG = timedelta(seconds=5)
+
+# Resources served by api_sync: name -> (model, serializer)
+SYNC_RESOURCES = {
+    'movies': (Movie, lambda movie: serialize_content(movie, MOVIE_FIELDS + ('updated_at',))),
+    'series': (Series, lambda series: serialize_content(series, SERIES_FIELDS + ('updated_at',))),
+    'sections': (Section, serialize_section_for_sync),
+    'section-items': (SectionItem, serialize_section_item_for_sync),
+}
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_sync(request, resource):
+    """
+    API endpoint for incremental sync of movies, series, sections and section items
+    
+    Returns the rows changed since ?since= (an ISO timestamp) as "upserts"
+    and the ids deleted since then as "tombstones". Both are keyset
+    paginated, upserts on (updated_at, id) and tombstones on (deleted_at,
+    id); pass "next_cursor" and "next_tombstone_cursor" back as ?cursor=
+    and ?tombstone_cursor= to get the next page, or to pick up later
+    changes once has_more is false. Without ?since= or ?cursor= every row
+    is returned.
+    
+    Only changes older than SYNC_COMMIT_LAG are returned: a row is stamped
+    when it is saved but only visible once its transaction commits, so a
+    cursor placed at "now" could skip writes still in flight.
+    """
+    if resource not in SYNC_RESOURCES:
+        return JsonResponse({'error': f"Unknown resource '{resource}'"}, status=404)
+    model, serialize = SYNC_RESOURCES[resource]
+    
+    try:
+        until = timezone.now() - SYNC_COMMIT_LAG
         
-        data = [
-            {
-                'id': series.id,
-                'title': series.title,
-                'description': series.description,
-                'poster_url': series.poster_url,
-                'background_image_url': series.background_image_url,
-                'link': series.link,
-                'seasons': series.seasons,
-                'episodes_count': series.episodes_count,
-                'release_year': series.release_year,
-                'created_at': series.created_at.isoformat(),
-                'genres': [genre.name for genre in series.genres.all()],
-            }
-            for series in series_list
-        ]
+        cursor = request.GET.get('cursor')
+        tombstone_cursor = request.GET.get('tombstone_cursor')
+        since = None
+        if cursor:
+            since, _ = decode_cursor(cursor, 'updated')
+        elif request.GET.get('since'):
+            since = parse_datetime(request.GET['since'])
+            if since is None:
+                raise PaginationError("since must be an ISO 8601 timestamp")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            cursor = encode_cursor('updated', since, 0)
+        if since is not None and not tombstone_cursor:
+            tombstone_cursor = encode_cursor('deleted', since, 0)
+        page_size = get_page_size(request.GET.get('limit'))
         
-        return JsonResponse(data, safe=False)
-    
+        queryset = model.objects.filter(updated_at__lt=until)
+        if model in (Movie, Series):
+            queryset = queryset.prefetch_related(
+                Prefetch('genres', queryset=Genre.objects.only('name'))
+            )
+        rows, next_cursor = paginate(queryset, ordering='updated', cursor=cursor, page_size=page_size)
+        
+        # A full sync has nothing to delete, so it starts with no tombstones
+        tombstones, next_tombstone_cursor = [], None
+        if tombstone_cursor:
+            tombstones, next_tombstone_cursor = paginate(
+                Tombstone.objects.filter(
+                    content_type=ContentType.objects.get_for_model(model), deleted_at__lt=until
+                ).only('object_id', 'deleted_at'),
+                ordering='deleted',
+                cursor=tombstone_cursor,
+                page_size=page_size,
+            )
+        
+        return JsonResponse({
+            'upserts': [serialize(row) for row in rows],
+            'tombstones': [tombstone.object_id for tombstone in tombstones],
+            'has_more': next_cursor is not None or next_tombstone_cursor is not None,
+            # Once caught up, resume from until: everything before it was returned
+            'next_cursor': next_cursor or encode_cursor('updated', until, 0),
+            'next_tombstone_cursor': next_tombstone_cursor or encode_cursor('deleted', until, 0),
+        })
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -138,96 +430,16 @@ def page_data(request):
     for the React frontend to render
     """
     try:
-        # Get the active landing page or create a default one
-        landing_page = LandingPage.get_active()
-        
-        # Build the page structure based on database content
-        page_json = {
-            "type": "page",
-            "children": []
-        }
+        # Serve the precompiled snapshot of the active landing page
+        snapshot = get_page_snapshot()
+        etag = quote_etag(f'page-{snapshot.landing_page_id}-{snapshot.version}')
         
-        # Get all sections for this landing page in order
-        landing_page_sections = LandingPageSection.objects.filter(
-            landing_page=landing_page
-        ).select_related('section').order_by('position')
+        def build_response():
+            response = HttpResponse(snapshot.body, content_type='application/json')
+            response['X-Page-Version'] = snapshot.version
+            return response
         
-        for lp_section in landing_page_sections:
-            section = lp_section.section
-            
-            # Always use section.name as the title
-            print(section.settings)
-            print(section.name)
-            section_json = {
-                "type": section.section_type,
-                "attributes": {
-                    "title": section.settings.get('title', section.name),
-                    **section.settings  # Include any additional settings
-                },
-                "children": []
-            }
-            
-            # Get content for this section
-            content_items = section.get_content()
-            
-            # Process content items based on section type
-            if section.section_type == 'hero' and content_items:
-                # For hero, we just use the first item
-                if content_items:
-                    hero_content = content_items[0]
-                    if isinstance(hero_content, tuple):  # For automatic selection
-                        content, content_type = hero_content
-                    else:  # For manual selection
-                        content = hero_content
-                        content_type = content.get_content_type() if hasattr(content, 'get_content_type') else 'unknown'
-                    
-                    # Check if content is not None before accessing attributes
-                    if content is not None:
-                        section_json["attributes"].update({
-                            "backgroundImage": content.background_image_url,
-                            "title": content.title,  # This is the movie/series title
-                            "description": content.description,
-                            "contentType": content_type,
-                            "cta": {"text": "Watch Now", "link": content.link}
-                        })
-                
-            else:
-                # For other section types (carousel, grid, etc.)
-                for item in content_items:
-                    if isinstance(item, tuple):  # For automatic selection
-                        content, content_type = item
-                    else:  # For manual selection
-                        content = item
-                        content_type = content.get_content_type() if hasattr(content, 'get_content_type') else 'unknown'
-                    
-                    # Check if content is not None before creating JSON
-                    if content is not None:
-                        content_json = {
-                            "type": f"{content_type}-card",
-                            "attributes": {
-                                "title": content.title,
-                                "poster": content.poster_url,
-                                "link": content.link,
-                                "contentType": content_type,
-                            }
-                        }
-                        
-                        # Add content type specific attributes
-                        if content_type == 'movie' and hasattr(content, 'duration_minutes'):
-                            content_json["attributes"]["duration"] = content.duration_minutes
-                            content_json["attributes"]["releaseYear"] = content.release_year
-                        elif content_type == 'series' and hasattr(content, 'seasons'):
-                            content_json["attributes"]["seasons"] = content.seasons
-                            content_json["attributes"]["episodes"] = content.episodes_count
-                            content_json["attributes"]["releaseYear"] = content.release_year
-                        
-                        section_json["children"].append(content_json)
-            
-            # Only add sections with content
-            if section.section_type == 'hero' or section_json["children"]:
-                page_json["children"].append(section_json)
-        
-        return JsonResponse(page_json)
+        return conditional_response(request, etag, page_last_modified(snapshot), build_response)
     
     except Exception as e:
         # Log the error for debugging
@@ -245,7 +457,7 @@ def page_data(request):
 @staff_member_required
 def admin_dashboard(request):
     # Get active landing page
-    landing_page = LandingPage.get_active()
+    landing_page = LandingPage.get_or_create_active()
     
     # Get all landing pages
     landing_pages = LandingPage.objects.all()
@@ -341,10 +553,7 @@ def add_section_to_landing_page(request, landing_page_id, section_id):
     # Check if this section is already in the landing page
     if not LandingPageSection.objects.filter(landing_page=landing_page, section=section).exists():
         # Get max position for new section
-        max_position = LandingPageSection.objects.filter(landing_page=landing_page).aggregate(
-            max_pos=Max('position')
-        )['max_pos']
-        position = 0 if max_position is None else max_position + 1
+        position = next_position(LandingPageSection.objects.filter(landing_page=landing_page))
         
         # Add section to landing page
         LandingPageSection.objects.create(landing_page=landing_page, section=section, position=position)
@@ -377,16 +586,14 @@ def reorder_landing_page_sections(request, landing_page_id):
     
     section_order = request.POST.get('section_order', '')
     if section_order:
-        landing_page_section_ids = section_order.split(',')
-        for position, landing_page_section_id in enumerate(landing_page_section_ids):
-            try:
-                landing_page_section = LandingPageSection.objects.get(id=landing_page_section_id)
-                landing_page_section.position = position
-                landing_page_section.save()
-            except LandingPageSection.DoesNotExist:
-                pass
-        
-        messages.success(request, "Section order updated successfully")
+        try:
+            apply_order(
+                LandingPageSection.objects.filter(landing_page=landing_page),
+                section_order
+            )
+            messages.success(request, "Section order updated successfully")
+        except OrderingError as e:
+            messages.error(request, str(e))
     
     return redirect('admin-landing-page-sections', landing_page_id=landing_page_id)
 
@@ -416,8 +623,7 @@ def create_section(request):
     
     if name and section_type:
         # Get the max position for new section
-        max_position = Section.objects.all().aggregate(max_pos=Max('position'))['max_pos']
-        position = 0 if max_position is None else max_position + 1
+        position = next_position(Section.objects.all())
         
         # Create section
         section = Section(
@@ -489,27 +695,31 @@ def delete_section(request, section_id):
 def reorder_sections(request):
     section_order = request.POST.get('section_order', '')
     if section_order:
-        section_ids = section_order.split(',')
-        for position, section_id in enumerate(section_ids):
-            try:
-                section = Section.objects.get(id=section_id)
-                section.position = position
-                section.save()
-            except Section.DoesNotExist:
-                pass
-        
-        messages.success(request, "Section order updated successfully")
+        try:
+            apply_order(Section.objects.all(), section_order)
+            messages.success(request, "Section order updated successfully")
+        except OrderingError as e:
+            messages.error(request, str(e))
     
     return redirect('admin-sections')
 
 # Section Content Management
+
+# Most titles of each type the content picker lists at once
+PICKER_LIMIT = 100
+
 @staff_member_required
 def admin_section_content(request, section_id):
     section = get_object_or_404(Section, id=section_id)
     
     # If automatic selection, just show the genre and content
     if section.content_selection_type == 'automatic':
-        if section.auto_genre:
+        if 'rules' in section.settings:
+            # Preview what the rule selects, resolved from its cards
+            cards = section.get_content()
+            movies = Movie.objects.filter(id__in=[card.object_id for card in cards if card.kind == 'movie'])
+            series = Series.objects.filter(id__in=[card.object_id for card in cards if card.kind == 'series'])
+        elif section.auto_genre:
             movies = Movie.objects.filter(genres=section.auto_genre).order_by('-created_at')
             series = Series.objects.filter(genres=section.auto_genre).order_by('-created_at')
         else:
@@ -523,31 +733,47 @@ def admin_section_content(request, section_id):
         })
     
     # For manual selection
-    # Get content in this section with ordering
-    section_items = SectionItem.objects.filter(section=section).order_by('position')
+    # Get content in this section with ordering, resolved in bulk
+    section_items = resolve_section_items(
+        SectionItem.objects.filter(section=section).order_by('position')
+    )
     
     # Get all content not in this section
     movie_content_type = ContentType.objects.get_for_model(Movie)
     series_content_type = ContentType.objects.get_for_model(Series)
     
     # Get IDs of content already in the section
-    movie_ids_in_section = section_items.filter(
-        content_type=movie_content_type
-    ).values_list('object_id', flat=True)
-    
-    series_ids_in_section = section_items.filter(
-        content_type=series_content_type
-    ).values_list('object_id', flat=True)
-    
-    # Get available content
-    available_movies = Movie.objects.exclude(id__in=movie_ids_in_section).order_by('title')
-    available_series = Series.objects.exclude(id__in=series_ids_in_section).order_by('title')
+    movie_ids_in_section = [
+        item.object_id for item in section_items
+        if item.content_type_id == movie_content_type.id
+    ]
+    
+    series_ids_in_section = [
+        item.object_id for item in section_items
+        if item.content_type_id == series_content_type.id
+    ]
+    
+    # Get available content: the best search matches for ?q=, otherwise the
+    # first titles, so the picker never loads the whole catalogue
+    available_movies = Movie.objects.exclude(id__in=movie_ids_in_section).prefetch_related('genres')
+    available_series = Series.objects.exclude(id__in=series_ids_in_section).prefetch_related('genres')
+    
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        try:
+            cards, _ = search(parse_search({'q': search_query, 'limit': PICKER_LIMIT}))
+        except SearchError:
+            cards = []
+        available_movies = available_movies.filter(id__in=[card.object_id for card in cards if card.kind == 'movie'])
+        available_series = available_series.filter(id__in=[card.object_id for card in cards if card.kind == 'series'])
     
     return render(request, 'admin/section_content.html', {
         'section': section,
         'section_items': section_items,
-        'available_movies': available_movies,
-        'available_series': available_series
+        'available_movies': available_movies.order_by('title')[:PICKER_LIMIT],
+        'available_series': available_series.order_by('title')[:PICKER_LIMIT],
+        'search_query': search_query,
+        'picker_limit': PICKER_LIMIT,
     })
 
 @staff_member_required
@@ -589,10 +815,7 @@ def add_content_to_section(request, section_id):
             object_id=content_id
         ).exists():
             # Get max position for new content
-            max_position = SectionItem.objects.filter(section=section).aggregate(
-                max_pos=Max('position')
-            )['max_pos']
-            position = 0 if max_position is None else max_position + 1
+            position = next_position(SectionItem.objects.filter(section=section))
             
             # Add content to section
             SectionItem.objects.create(
@@ -631,16 +854,11 @@ def reorder_section_content(request, section_id):
     
     content_order = request.POST.get('content_order', '')
     if content_order:
-        section_item_ids = content_order.split(',')
-        for position, section_item_id in enumerate(section_item_ids):
-            try:
-                section_item = SectionItem.objects.get(id=section_item_id, section=section)
-                section_item.position = position
-                section_item.save()
-            except SectionItem.DoesNotExist:
-                pass
-        
-        messages.success(request, "Content order updated successfully")
+        try:
+            apply_order(SectionItem.objects.filter(section=section), content_order)
+            messages.success(request, "Content order updated successfully")
+        except OrderingError as e:
+            messages.error(request, str(e))
     
     return redirect('admin-section-content', section_id=section_id)
 
@@ -1154,8 +1372,7 @@ def api_create_section(request):
         data = json.loads(request.body)
         
         # Get max position for new section
-        max_position = Section.objects.all().aggregate(max_pos=Max('position'))['max_pos']
-        position = 0 if max_position is None else max_position + 1
+        position = next_position(Section.objects.all())
         
         section = Section.objects.create(
             name=data['name'],
@@ -1188,6 +1405,10 @@ def api_update_section(request, section_id):
         section.content_selection_type = data.get('content_selection_type', 'manual')
         # Save settings if present
         if 'settings' in data:
+            # Reject rules that are malformed, exceed the rule limits or
+            # cannot fill their page within the rows they may walk
+            if isinstance(data['settings'], dict) and 'rules' in data['settings']:
+                check_rule_cost(compile_rule(data['settings']['rules']))
             section.settings = data['settings']
         # Update auto genre if automatic selection
         if data.get('content_selection_type') == 'automatic' and data.get('auto_genre_id'):
@@ -1200,6 +1421,8 @@ def api_update_section(request, section_id):
             section.auto_genre = None
         section.save()
         return JsonResponse({'message': 'Section updated successfully'})
+    except RuleError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -1220,17 +1443,10 @@ def api_reorder_sections(request):
     """API endpoint for reordering sections"""
     try:
         data = json.loads(request.body)
-        section_order = data.get('section_order', '')
-        if section_order:
-            section_ids = section_order.split(',')
-            for position, section_id in enumerate(section_ids):
-                try:
-                    section = Section.objects.get(id=section_id)
-                    section.position = position
-                    section.save()
-                except Section.DoesNotExist:
-                    pass
-        return JsonResponse({'message': 'Section order updated successfully'})
+        order = apply_order(Section.objects.all(), data.get('section_order', ''))
+        return JsonResponse({'message': 'Section order updated successfully', 'order': order})
+    except OrderingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -1241,7 +1457,9 @@ def api_section_content(request, section_id):
     """API endpoint for section content"""
     try:
         section = get_object_or_404(Section, id=section_id)
-        section_items = SectionItem.objects.filter(section=section).order_by('position')
+        section_items = SectionItem.objects.filter(
+            section=section
+        ).select_related('card', 'content_type').order_by('position')
         
         data = []
         for item in section_items:
@@ -1253,11 +1471,11 @@ def api_section_content(request, section_id):
             }
             
             # Add content details
-            if item.content_object:
+            if item.card:
                 content_data['content'] = {
-                    'title': item.content_object.title,
-                    'poster_url': item.content_object.poster_url,
-                    'description': item.content_object.description,
+                    'title': item.card.title,
+                    'poster_url': item.card.poster_url,
+                    'description': item.card.description,
                 }
             
             data.append(content_data)
@@ -1292,10 +1510,7 @@ def api_add_content_to_section(request, section_id):
                 object_id=content_id
             ).exists():
                 # Get max position for new content
-                max_position = SectionItem.objects.filter(section=section).aggregate(
-                    max_pos=Max('position')
-                )['max_pos']
-                position = 0 if max_position is None else max_position + 1
+                position = next_position(SectionItem.objects.filter(section=section))
                 
                 # Add content to section
                 SectionItem.objects.create(
@@ -1312,6 +1527,102 @@ def api_add_content_to_section(request, section_id):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+# Content types accepted when adding content to a section
+SECTION_CONTENT_MODELS = {
+    'movie': Movie,
+    'series': Series,
+}
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_bulk_add_content_to_section(request, section_id):
+    """
+    API endpoint for adding many content items to a section at once
+    
+    Expects {"items": [{"content_type": "movie", "content_id": 1}, ...]}.
+    Items are validated with one in_bulk query per content type and inserted
+    with a single bulk_create, appended in the given order. Unknown content
+    and content already in the section are skipped and reported.
+    """
+    try:
+        section = get_object_or_404(Section, id=section_id)
+        data = json.loads(request.body)
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'error': 'items must be a non-empty list'}, status=400)
+        
+        # Parse the requested (type, id) pairs, keeping their order
+        requested = []
+        for item in items:
+            try:
+                content_type = item['content_type']
+                content_id = int(item['content_id'])
+            except (KeyError, TypeError, ValueError):
+                return JsonResponse({'error': 'Each item needs a content_type and an integer content_id'}, status=400)
+            if content_type not in SECTION_CONTENT_MODELS:
+                return JsonResponse({'error': f"Invalid content type '{content_type}'"}, status=400)
+            requested.append((content_type, content_id))
+        
+        # One query per content type for the content and one for existing items
+        content_types = {
+            name: ContentType.objects.get_for_model(model)
+            for name, model in SECTION_CONTENT_MODELS.items()
+        }
+        found = set()
+        for name, model in SECTION_CONTENT_MODELS.items():
+            ids = [content_id for content_type, content_id in requested if content_type == name]
+            if ids:
+                found.update((name, content_id) for content_id in model.objects.in_bulk(ids))
+        type_names = {content_type.id: name for name, content_type in content_types.items()}
+        existing = {
+            (type_names.get(content_type_id), object_id)
+            for content_type_id, object_id in SectionItem.objects.filter(
+                section=section,
+                object_id__in=[content_id for _, content_id in requested]
+            ).values_list('content_type_id', 'object_id')
+        }
+        
+        added = []
+        skipped = []
+        for pair in requested:
+            if pair not in found:
+                skipped.append((pair, 'not_found'))
+            elif pair in existing:
+                skipped.append((pair, 'duplicate'))
+            else:
+                added.append(pair)
+                existing.add(pair)
+        
+        if added:
+            with transaction.atomic():
+                position = next_position(SectionItem.objects.filter(section=section))
+                # bulk_create bypasses pre_save, so point items at their cards here
+                section_items = SectionItem.objects.bulk_create(attach_cards([
+                    SectionItem(
+                        section=section,
+                        content_type=content_types[content_type],
+                        object_id=content_id,
+                        position=position + index * POSITION_GAP
+                    )
+                    for index, (content_type, content_id) in enumerate(added)
+                ]), ignore_conflicts=True)
+                # bulk_create bypasses post_save, so invalidate explicitly
+                invalidate_rows(section_items)
+        
+        return JsonResponse({
+            'message': f'Added {len(added)} item(s) to section',
+            'added': [
+                {'content_type': content_type, 'content_id': content_id}
+                for content_type, content_id in added
+            ],
+            'skipped': [
+                {'content_type': content_type, 'content_id': content_id, 'reason': reason}
+                for (content_type, content_id), reason in skipped
+            ],
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 @csrf_exempt
 @require_http_methods(["DELETE"])
 def api_remove_content_from_section(request, section_id, item_id):
@@ -1329,17 +1640,30 @@ def api_reorder_section_content(request, section_id):
     """API endpoint for reordering section content"""
     try:
         data = json.loads(request.body)
-        content_order = data.get('content_order', '')
-        if content_order:
-            section_item_ids = content_order.split(',')
-            for position, section_item_id in enumerate(section_item_ids):
-                try:
-                    section_item = SectionItem.objects.get(id=section_item_id, section_id=section_id)
-                    section_item.position = position
-                    section_item.save()
-                except SectionItem.DoesNotExist:
-                    pass
-        return JsonResponse({'message': 'Content order updated successfully'})
+        order = apply_order(
+            SectionItem.objects.filter(section_id=section_id),
+            data.get('content_order', '')
+        )
+        return JsonResponse({'message': 'Content order updated successfully', 'order': order})
+    except OrderingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_move_section_content(request, section_id, item_id):
+    """API endpoint for moving one content item after another (after_id=null moves it first)"""
+    try:
+        data = json.loads(request.body)
+        item = move_after(
+            SectionItem.objects.filter(section_id=section_id),
+            item_id,
+            data.get('after_id')
+        )
+        return JsonResponse({'message': 'Content moved successfully', 'position': item.position})
+    except OrderingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -1349,31 +1673,11 @@ def api_reorder_section_content(request, section_id):
 def api_landing_page_detail(request, landing_page_id):
     """API endpoint for single landing page detail"""
     try:
-        landing_page = get_object_or_404(LandingPage, id=landing_page_id)
-        landing_page_sections = LandingPageSection.objects.filter(
-            landing_page=landing_page
-        ).select_related('section').order_by('position')
-        
-        data = {
-            'id': landing_page.id,
-            'name': landing_page.name,
-            'is_active': landing_page.is_active,
-            'created_at': landing_page.created_at.isoformat(),
-            'updated_at': landing_page.updated_at.isoformat(),
-            'landingpagesection_set': [
-                {
-                    'id': lp_section.id,
-                    'position': lp_section.position,
-                    'section': {
-                        'id': lp_section.section.id,
-                        'name': lp_section.section.name,
-                        'section_type': lp_section.section.section_type,
-                        'content_selection_type': lp_section.section.content_selection_type,
-                    }
-                }
-                for lp_section in landing_page_sections
-            ]
-        }
+        landing_page = get_object_or_404(
+            LandingPage.objects.prefetch_related(landing_page_sections_prefetch()),
+            id=landing_page_id
+        )
+        data = serialize_landing_page(landing_page, landing_page.landingpagesection_set.all())
         return JsonResponse(data)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -1438,10 +1742,7 @@ def api_add_section_to_landing_page(request, landing_page_id, section_id):
         # Check if section already exists in landing page
         if not LandingPageSection.objects.filter(landing_page=landing_page, section=section).exists():
             # Get max position for new section
-            max_position = LandingPageSection.objects.filter(landing_page=landing_page).aggregate(
-                max_pos=Max('position')
-            )['max_pos']
-            position = 0 if max_position is None else max_position + 1
+            position = next_position(LandingPageSection.objects.filter(landing_page=landing_page))
             
             # Add section to landing page
             LandingPageSection.objects.create(landing_page=landing_page, section=section, position=position)
@@ -1468,16 +1769,41 @@ def api_reorder_landing_page_sections(request, landing_page_id):
     """API endpoint for reordering landing page sections"""
     try:
         data = json.loads(request.body)
-        section_order = data.get('section_order', '')
-        if section_order:
-            landing_page_section_ids = section_order.split(',')
-            for position, landing_page_section_id in enumerate(landing_page_section_ids):
-                try:
-                    landing_page_section = LandingPageSection.objects.get(id=landing_page_section_id, landing_page_id=landing_page_id)
-                    landing_page_section.position = position
-                    landing_page_section.save()
-                except LandingPageSection.DoesNotExist:
-                    pass
-        return JsonResponse({'message': 'Section order updated successfully'})
+        order = apply_order(
+            LandingPageSection.objects.filter(landing_page_id=landing_page_id),
+            data.get('section_order', '')
+        )
+        return JsonResponse({'message': 'Section order updated successfully', 'order': order})
+    except OrderingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_move_landing_page_section(request, landing_page_id, section_id):
+    """API endpoint for moving one landing page section after another (after_section_id=null moves it first)"""
+    try:
+        data = json.loads(request.body)
+        landing_page_sections = LandingPageSection.objects.filter(landing_page_id=landing_page_id)
+        
+        # Sections are addressed by section id, as in the add/remove endpoints
+        ids = dict(landing_page_sections.filter(
+            section_id__in=[section_id, data.get('after_section_id')]
+        ).values_list('section_id', 'id'))
+        if section_id not in ids:
+            return JsonResponse({'error': 'Section is not in landing page'}, status=400)
+        after_section_id = data.get('after_section_id')
+        if after_section_id is not None and after_section_id not in ids:
+            return JsonResponse({'error': 'After section is not in landing page'}, status=400)
+        
+        landing_page_section = move_after(
+            landing_page_sections,
+            ids[section_id],
+            ids.get(after_section_id)
+        )
+        return JsonResponse({'message': 'Section moved successfully', 'position': landing_page_section.position})
+    except OrderingError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
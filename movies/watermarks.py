@@ -0,0 +1,141 @@
+"""
+Cheap per-table change watermarks for conditional GETs.
+
+Every write to a table bumps a version counter and a last-modified time held
+in the cache. List endpoints derive their ETag and Last-Modified from the
+watermarks of the tables they read, so a client that already has the
+current data gets a 304 without the body being built at all.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .versions import initial_version
+from . import shared_cache
+
+VERSION_KEY = 'table_version:{table}'
+MODIFIED_KEY = 'table_modified:{table}'
+
+
+def table_name(model):
+    """Watermark name for a model's table"""
+    return model._meta.model_name
+
+
+def touch(*tables):
+    """Record a change to these tables once the current transaction commits"""
+    transaction.on_commit(lambda: _bump(tables))
+
+
+def get_watermark(tables):
+    """Get (etag, last_modified timestamp) for the combined state of tables"""
+    cached = cache.get_many(_watermark_keys(tables))
+    for table in _missing(tables, cached):
+        cached.update(_initialise(table))
+    return _combine(tables, cached)
+
+
+async def aget_watermark(tables):
+    """Async version of get_watermark()"""
+    cached = await cache.aget_many(_watermark_keys(tables))
+    for table in _missing(tables, cached):
+        cached.update(await _ainitialise(table))
+    return _combine(tables, cached)
+
+
+def conditional_response(request, etag, last_modified, build_response):
+    """
+    Answer a conditional GET with 304 when the client is up to date.
+
+    Otherwise build_response() is called and the validators are added to the
+    response it returns.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+    return _with_validators(build_response(), etag, last_modified)
+
+
+def conditional_table_response(request, tables, build_response):
+    """conditional_response() validated by the watermarks of tables"""
+    etag, last_modified = get_watermark(tables)
+    return conditional_response(request, etag, last_modified, build_response)
+
+
+async def aconditional_table_response(request, tables, build_response):
+    """Async version of conditional_table_response(); build_response is a coroutine function"""
+    etag, last_modified = await aget_watermark(tables)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+    return _with_validators(await build_response(), etag, last_modified)
+
+
+def _watermark_keys(tables):
+    keys = []
+    for table in tables:
+        keys.extend([VERSION_KEY.format(table=table), MODIFIED_KEY.format(table=table)])
+    return keys
+
+
+def _missing(tables, cached):
+    return [
+        table for table in tables
+        if VERSION_KEY.format(table=table) not in cached or MODIFIED_KEY.format(table=table) not in cached
+    ]
+
+
+def _combine(tables, cached):
+    versions = []
+    last_modified = 0
+    for table in tables:
+        versions.append(f'{table}:{cached[VERSION_KEY.format(table=table)]}')
+        last_modified = max(last_modified, cached[MODIFIED_KEY.format(table=table)])
+
+    digest = hashlib.sha1(','.join(versions).encode('ascii')).hexdigest()[:20]
+    return quote_etag(digest), last_modified
+
+
+def _with_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _bump(tables):
+    now = int(time.time())
+    for table in tables:
+        try:
+            cache.incr(VERSION_KEY.format(table=table))
+        except ValueError:
+            cache.set(VERSION_KEY.format(table=table), initial_version(), shared_cache.timeout(None))
+        cache.set(MODIFIED_KEY.format(table=table), now, shared_cache.timeout(None))
+
+
+def _initialise(table):
+    # Unknown state (cold or flushed cache): start from the clock, so the new
+    # watermark can never match one handed out before
+    version_key, modified_key = VERSION_KEY.format(table=table), MODIFIED_KEY.format(table=table)
+    version, modified = initial_version(), int(time.time())
+    cache.add(version_key, version, shared_cache.timeout(None))
+    cache.add(modified_key, modified, shared_cache.timeout(None))
+    return {
+        version_key: cache.get(version_key, version),
+        modified_key: cache.get(modified_key, modified),
+    }
+
+
+async def _ainitialise(table):
+    version_key, modified_key = VERSION_KEY.format(table=table), MODIFIED_KEY.format(table=table)
+    version, modified = initial_version(), int(time.time())
+    await cache.aadd(version_key, version, shared_cache.timeout(None))
+    await cache.aadd(modified_key, modified, shared_cache.timeout(None))
+    return {
+        version_key: await cache.aget(version_key, version),
+        modified_key: await cache.aget(modified_key, modified),
+    }